@@ -1,7 +1,10 @@
 from django.contrib import admin
+from .leave_balances import post_ledger_entries
+from .utils import deactivate_attendance_records
 from .models import (
-    Shift, AttendanceRecord, AttendanceLog,
-    AttendanceEdit, Leave, Holiday
+    Shift, ShiftRotation, ShiftRotationStep, ShiftAssignment,
+    AttendanceRecord, AttendanceLog, AttendanceEdit, Leave, LeaveLedgerEntry, LeaveBalance,
+    Holiday, DailyAttendanceStatus, ImportJob
 )
 
 @admin.register(Shift)
@@ -10,6 +13,25 @@ class ShiftAdmin(admin.ModelAdmin):
     list_filter = ('is_night_shift', 'is_active')
     search_fields = ('name',)
 
+class ShiftRotationStepInline(admin.TabularInline):
+    model = ShiftRotationStep
+    extra = 1
+
+@admin.register(ShiftRotation)
+class ShiftRotationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'anchor_date', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+    inlines = [ShiftRotationStepInline]
+
+@admin.register(ShiftAssignment)
+class ShiftAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'department', 'shift', 'rotation', 'start_date', 'end_date', 'is_active')
+    list_filter = ('shift', 'rotation', 'department', 'is_active')
+    search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
+    date_hierarchy = 'start_date'
+    raw_id_fields = ('employee', 'created_by')
+
 @admin.register(AttendanceRecord)
 class AttendanceRecordAdmin(admin.ModelAdmin):
     list_display = ('employee', 'timestamp', 'device_name', 'event_point', 'is_active')
@@ -17,10 +39,16 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
     date_hierarchy = 'timestamp'
     raw_id_fields = ('employee',)
+    actions = ['deactivate_records']
+
+    @admin.action(description='Deactivate selected records and refresh logs')
+    def deactivate_records(self, request, queryset):
+        count = deactivate_attendance_records(queryset)
+        self.message_user(request, f'{count} records deactivated')
 
 @admin.register(AttendanceLog)
 class AttendanceLogAdmin(admin.ModelAdmin):
-    list_display = ('employee', 'date', 'first_in_time', 'last_out_time', 'source', 'is_active')
+    list_display = ('employee', 'date', 'first_in_time', 'last_out_time', 'shift', 'late_minutes', 'source', 'is_active')
     list_filter = ('source', 'is_active', 'shift')
     search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
     date_hierarchy = 'date'
@@ -42,10 +70,57 @@ class LeaveAdmin(admin.ModelAdmin):
     date_hierarchy = 'start_date'
     raw_id_fields = ('employee', 'approved_by')
 
+@admin.register(LeaveLedgerEntry)
+class LeaveLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'leave_type', 'entry_type', 'amount', 'effective_date', 'period', 'leave')
+    list_filter = ('leave_type', 'entry_type')
+    search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
+    date_hierarchy = 'effective_date'
+    raw_id_fields = ('employee', 'leave', 'created_by')
+
+    def save_model(self, request, obj, form, change):
+        obj.created_by = request.user
+        post_ledger_entries([obj])
+
+    def has_change_permission(self, request, obj=None):
+        # The ledger is append-only; corrections are new adjustment entries
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'leave_type', 'accrued', 'used', 'adjusted', 'balance', 'updated_at')
+    list_filter = ('leave_type',)
+    search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
+    readonly_fields = ('accrued', 'used', 'adjusted', 'balance', 'updated_at')
+    raw_id_fields = ('employee',)
+
+    def has_add_permission(self, request):
+        # Snapshots are written by the ledger
+        return False
+
 @admin.register(Holiday)
 class HolidayAdmin(admin.ModelAdmin):
     list_display = ('date', 'description', 'is_paid', 'is_active')
     list_filter = ('is_paid', 'is_active')
     search_fields = ('description',)
     date_hierarchy = 'date'
+    raw_id_fields = ('created_by',)
+
+@admin.register(DailyAttendanceStatus)
+class DailyAttendanceStatusAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'date', 'status', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('employee__first_name', 'employee__last_name', 'employee__employee_number')
+    date_hierarchy = 'date'
+    raw_id_fields = ('employee', 'attendance_log', 'leave')
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_filename', 'status', 'rows_parsed', 'records_created', 'duplicates', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('original_filename',)
+    date_hierarchy = 'created_at'
     raw_id_fields = ('created_by',)
\ No newline at end of file
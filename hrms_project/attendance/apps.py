@@ -10,4 +10,4 @@ class AttendanceConfig(AppConfig):
         Import signals when the app is ready
         Make sure any custom configurations are loaded
         """
-        pass  # Add any startup logic here
+        from . import signals  # noqa: F401
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.http import urlencode
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Raised by the cache backend when the Redis server is unreachable or fails
+CACHE_ERRORS = (RedisError, OSError)
+
+CACHE_PREFIX = 'attendance'
+
+# Endpoints served through cached_response, reported by get_cache_stats
+CACHED_ENDPOINTS = ['calendar', 'calendar-events', 'logs']
+
+# Version bumped on every change, used by requests without a date range
+ALL_MONTHS = 'all'
+
+# Version bumped on every employee change. Names, departments, joined dates and
+# the active flag feed the responses of every month, so it is part of every
+# data version.
+EMPLOYEES = 'employees'
+
+def is_shared_cache():
+    """
+    Whether the cache is seen by every web and Celery process. Version bumps
+    made in one process never reach the others through a per-process cache.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+def _version_key(month):
+    return f'{CACHE_PREFIX}:version:{month}'
+
+def _stats_key(endpoint, outcome):
+    return f'{CACHE_PREFIX}:stats:{endpoint}:{outcome}'
+
+def months_between(start_date, end_date):
+    """Return the 'YYYY-MM' labels of every month from start_date to end_date"""
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append(f'{year}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def get_data_version(start_date=None, end_date=None):
+    """
+    Data version of the months covered by a date range, or of all data when
+    no range is given, combined with the employees version. Counters missing
+    from the cache (never set or evicted) start from the current time in
+    nanoseconds, so a version is never reused.
+    Raises one of CACHE_ERRORS when the cache is unreachable.
+    """
+    if start_date and end_date:
+        keys = [_version_key(month) for month in months_between(start_date, end_date)]
+    else:
+        keys = [_version_key(ALL_MONTHS)]
+    keys.append(_version_key(EMPLOYEES))
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+def bump_data_version(start_date, end_date=None):
+    """
+    Invalidate cached responses covering any month from start_date to end_date.
+    The bump runs once the current transaction commits, so a response built
+    from not yet committed data is never stored under the new version. A bump
+    that cannot reach the cache is logged and dropped; it must not fail the
+    write that triggered it.
+    """
+    months = months_between(start_date, end_date or start_date) + [ALL_MONTHS]
+    transaction.on_commit(lambda: _increment_versions(months))
+
+def get_named_version(name):
+    """
+    Version counter of a named dataset (e.g. 'holidays'), shared by every
+    process, or None when the cache is unreachable
+    """
+    key = _version_key(name)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+    except CACHE_ERRORS as exc:
+        logger.warning('Cache unavailable, cannot read the %s version: %s', name, exc)
+        return None
+    return version
+
+def bump_named_version(name):
+    """Bump a named version counter once the current transaction commits"""
+    transaction.on_commit(lambda: _increment_versions([name]))
+
+def _increment_versions(months):
+    try:
+        for month in months:
+            key = _version_key(month)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), timeout=None)
+    except CACHE_ERRORS as exc:
+        logger.warning('Cache unavailable, versions %s not bumped: %s', ', '.join(months), exc)
+
+def _count(endpoint, outcome):
+    key = _stats_key(endpoint, outcome)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+    except CACHE_ERRORS:
+        pass
+
+def cached_response(endpoint, params, start_date, end_date, build, vary=None):
+    """
+    Return the response data for endpoint and its query params, calling build()
+    only when nothing is cached for the current data version of the range.
+    vary: extra values the response depends on besides the data, e.g. today's date
+    Without a shared cache, invalidations made by other processes would be
+    missed, so build() is called every time; the same goes when the cache
+    cannot be reached.
+    """
+    if not is_shared_cache():
+        return build()
+
+    query = urlencode(sorted(
+        (name, values) for name, values in params.lists() if name != '_'
+    ), doseq=True)
+    if vary:
+        query += '|' + '|'.join(str(value) for value in vary)
+    digest = hashlib.md5(query.encode()).hexdigest()
+    try:
+        key = f'{CACHE_PREFIX}:{endpoint}:{get_data_version(start_date, end_date)}:{digest}'
+        data = cache.get(key)
+    except CACHE_ERRORS as exc:
+        logger.warning('Cache unavailable, building %s uncached: %s', endpoint, exc)
+        return build()
+    if data is not None:
+        _count(endpoint, 'hits')
+        return data
+
+    _count(endpoint, 'misses')
+    data = build()
+    try:
+        cache.set(key, data, getattr(settings, 'ATTENDANCE_CACHE_TIMEOUT', 86400))
+    except CACHE_ERRORS as exc:
+        logger.warning('Cache unavailable, %s response not stored: %s', endpoint, exc)
+    return data
+
+def get_cache_stats():
+    """
+    Return {endpoint: {'hits', 'misses', 'hit_rate'}} for the cached endpoints,
+    or None when the cache is unreachable
+    """
+    try:
+        counters = cache.get_many([
+            _stats_key(endpoint, outcome)
+            for endpoint in CACHED_ENDPOINTS for outcome in ('hits', 'misses')
+        ])
+    except CACHE_ERRORS:
+        return None
+    stats = {}
+    for endpoint in CACHED_ENDPOINTS:
+        hits = counters.get(_stats_key(endpoint, 'hits'), 0)
+        misses = counters.get(_stats_key(endpoint, 'misses'), 0)
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None
+        }
+    return stats
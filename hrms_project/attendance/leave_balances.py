@@ -0,0 +1,249 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from employees.models import Employee
+from .models import Leave, LeaveBalance, LeaveLedgerEntry
+from .working_days import get_employee_calendars
+
+# Balance snapshot field each ledger entry type moves, besides balance itself
+_BALANCE_FIELDS = {'accrual': 'accrued', 'consumption': 'used', 'adjustment': 'adjusted'}
+
+# Remarks marking the adjustment that opens an employee's balance of a leave type
+OPENING_REMARKS = 'Opening balance'
+
+def get_accrual_days():
+    """Days accrued per month for each leave type (ATTENDANCE_LEAVE_ACCRUAL_DAYS)"""
+    return {
+        leave_type: Decimal(str(days))
+        for leave_type, days in getattr(settings, 'ATTENDANCE_LEAVE_ACCRUAL_DAYS', {}).items()
+    }
+
+def post_ledger_entries(entries):
+    """
+    Insert ledger entries and apply them to the balance snapshots in the
+    same transaction. Amounts are summed per employee and leave type first,
+    and employees whose totals are equal share one UPDATE, so a monthly
+    accrual for everyone costs one UPDATE per leave type.
+    """
+    entries = list(entries)
+    if not entries:
+        return 0
+
+    totals = defaultdict(lambda: {'accrued': Decimal(0), 'used': Decimal(0), 'adjusted': Decimal(0)})
+    for entry in entries:
+        amount = Decimal(entry.amount)
+        # Consumption is stored negative in the ledger and counted up in used
+        field = _BALANCE_FIELDS[entry.entry_type]
+        totals[(entry.employee_id, entry.leave_type)][field] += -amount if field == 'used' else amount
+
+    groups = defaultdict(list)
+    for (employee_id, leave_type), amounts in totals.items():
+        groups[(leave_type, amounts['accrued'], amounts['used'], amounts['adjusted'])].append(employee_id)
+
+    with transaction.atomic():
+        LeaveLedgerEntry.objects.bulk_create(entries, batch_size=2000)
+        LeaveBalance.objects.bulk_create([
+            LeaveBalance(employee_id=employee_id, leave_type=leave_type)
+            for employee_id, leave_type in totals
+        ], batch_size=2000, ignore_conflicts=True)
+        for (leave_type, accrued, used, adjusted), employee_ids in groups.items():
+            LeaveBalance.objects.filter(leave_type=leave_type, employee_id__in=employee_ids).update(
+                accrued=F('accrued') + accrued,
+                used=F('used') + used,
+                adjusted=F('adjusted') + adjusted,
+                balance=F('balance') + accrued - used + adjusted,
+                updated_at=timezone.now()
+            )
+    return len(entries)
+
+def leave_consumption_entries(leaves, removed=False):
+    """
+    The consumption entries that bring the ledger in line with many leaves:
+    their working days while approved and active, nothing otherwise or once
+    removed. Moving to approved consumes, moving away (or a change of dates,
+    type or employee once approved) posts the difference. Leaves not saved
+    yet get entries without a leave, for checking balances before the save.
+    Costs one query for what is already posted and one for the calendars,
+    however many leaves.
+    """
+    leaves = list(leaves)
+    if not leaves:
+        return []
+    calendars = get_employee_calendars({leave.employee_id for leave in leaves})
+    posted = defaultdict(dict)
+    saved = [leave for leave in leaves if leave.pk]
+    if saved:
+        for row in LeaveLedgerEntry.objects.filter(leave__in=saved).values(
+            'leave_id', 'employee_id', 'leave_type'
+        ).annotate(total=Sum('amount')).order_by():
+            posted[row['leave_id']][(row['employee_id'], row['leave_type'])] = row['total']
+
+    entries = []
+    for leave in leaves:
+        target = {}
+        if leave.is_active and leave.status == 'approved' and not removed:
+            days = calendars[leave.employee_id].working_days_between(leave.start_date, leave.end_date)
+            target[(leave.employee_id, leave.leave_type)] = -Decimal(days)
+        for employee_id, leave_type in set(target) | set(posted[leave.pk]):
+            amount = target.get((employee_id, leave_type), 0) - posted[leave.pk].get((employee_id, leave_type), 0)
+            if amount:
+                entries.append(LeaveLedgerEntry(
+                    employee_id=employee_id,
+                    leave_type=leave_type,
+                    entry_type='consumption',
+                    amount=amount,
+                    effective_date=leave.start_date,
+                    leave_id=leave.pk,
+                    created_by_id=leave.approved_by_id
+                ))
+    return entries
+
+def sync_leave_consumption(leave, removed=False):
+    """Post the consumption entries of one leave (see leave_consumption_entries)"""
+    return post_ledger_entries(leave_consumption_entries([leave], removed))
+
+def leave_balance_errors(leaves, entries):
+    """
+    Approvals that would take an accruing leave type's balance below zero,
+    drawn against the locked balance snapshots in the order given.
+    entries: the leaves' consumption entries (leave_consumption_entries)
+    Returns: {leave_id: error}
+    """
+    limited = {leave_type for leave_type, days in get_accrual_days().items() if days}
+    needed = defaultdict(lambda: defaultdict(Decimal))
+    for entry in entries:
+        if entry.leave_type in limited:
+            needed[entry.leave_id][(entry.employee_id, entry.leave_type)] -= entry.amount
+    if not needed:
+        return {}
+    balances = defaultdict(Decimal)
+    for employee_id, leave_type, balance in LeaveBalance.objects.select_for_update().filter(
+        employee_id__in={leave.employee_id for leave in leaves}, leave_type__in=limited
+    ).values_list('employee_id', 'leave_type', 'balance'):
+        balances[(employee_id, leave_type)] = balance
+
+    errors = {}
+    for leave in leaves:
+        short = next((
+            key for key, days in needed[leave.id].items() if days > 0 and balances[key] < days
+        ), None)
+        if short:
+            errors[leave.id] = (
+                f'Insufficient {short[1]} balance: {needed[leave.id][short]} days needed, '
+                f'{balances[short]} available'
+            )
+            continue
+        for key, days in needed[leave.id].items():
+            balances[key] -= days
+    return errors
+
+def accrue_monthly_leave(month=None):
+    """
+    Post the month's accrual (ATTENDANCE_LEAVE_ACCRUAL_DAYS) for every active
+    employee who had joined by the end of the month, in bulk. Employees
+    already accrued for the month are skipped, so the job can be re-run.
+    Returns the number of entries posted.
+    """
+    month = (month or timezone.localdate()).replace(day=1)
+    period = month.strftime('%Y-%m')
+    month_end = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    accrual_days = get_accrual_days()
+
+    employee_ids = list(Employee.objects.filter(is_active=True).filter(
+        Q(joined_date__isnull=True) | Q(joined_date__lte=month_end)
+    ).values_list('id', flat=True))
+    accrued = set(LeaveLedgerEntry.objects.filter(
+        entry_type='accrual', period=period
+    ).values_list('employee_id', 'leave_type'))
+
+    return post_ledger_entries(
+        LeaveLedgerEntry(
+            employee_id=employee_id,
+            leave_type=leave_type,
+            entry_type='accrual',
+            amount=days,
+            effective_date=month,
+            period=period
+        )
+        for leave_type, days in accrual_days.items() if days
+        for employee_id in employee_ids if (employee_id, leave_type) not in accrued
+    )
+
+def post_opening_balances(days_by_type, effective_date=None):
+    """
+    Post an opening adjustment of days_by_type[leave_type] days for every
+    active employee who has none yet for that leave type, e.g. the balances
+    carried over when the ledger is introduced. Safe to re-run.
+    Returns the number of entries posted.
+    """
+    effective_date = effective_date or timezone.localdate()
+    employee_ids = list(Employee.objects.filter(is_active=True).values_list('id', flat=True))
+    opened = set(LeaveLedgerEntry.objects.filter(
+        entry_type='adjustment', remarks=OPENING_REMARKS
+    ).values_list('employee_id', 'leave_type'))
+
+    return post_ledger_entries(
+        LeaveLedgerEntry(
+            employee_id=employee_id,
+            leave_type=leave_type,
+            entry_type='adjustment',
+            amount=Decimal(str(days)),
+            effective_date=effective_date,
+            remarks=OPENING_REMARKS
+        )
+        for leave_type, days in days_by_type.items()
+        for employee_id in employee_ids if (employee_id, leave_type) not in opened
+    )
+
+def get_leave_balances(employee_id):
+    """
+    Balance of every leave type for one employee, read from the snapshot rows.
+    Returns: {leave_type: {'total', 'used', 'remaining'}}
+    """
+    snapshots = {
+        balance.leave_type: balance
+        for balance in LeaveBalance.objects.filter(employee_id=employee_id)
+    }
+    balances = {}
+    for leave_type, _ in Leave.LEAVE_TYPES:
+        snapshot = snapshots.get(leave_type) or LeaveBalance(leave_type=leave_type)
+        balances[leave_type] = {
+            'total': snapshot.accrued + snapshot.adjusted,
+            'used': snapshot.used,
+            'remaining': snapshot.balance
+        }
+    return balances
+
+def rebuild_leave_balances():
+    """
+    Repair job: post the consumption missing for any leave, then recompute
+    every balance snapshot from the ledger.
+    Returns the number of snapshots written.
+    """
+    with transaction.atomic():
+        for leave in Leave.objects.filter(Q(status='approved') | Q(ledger_entries__isnull=False)).distinct():
+            sync_leave_consumption(leave)
+
+        totals = LeaveLedgerEntry.objects.values('employee_id', 'leave_type').annotate(
+            accrued=Sum('amount', filter=Q(entry_type='accrual'), default=0),
+            consumed=Sum('amount', filter=Q(entry_type='consumption'), default=0),
+            adjusted=Sum('amount', filter=Q(entry_type='adjustment'), default=0)
+        ).order_by()
+        snapshots = [
+            LeaveBalance(
+                employee_id=row['employee_id'],
+                leave_type=row['leave_type'],
+                accrued=row['accrued'],
+                used=-row['consumed'],
+                adjusted=row['adjusted'],
+                balance=row['accrued'] + row['consumed'] + row['adjusted']
+            )
+            for row in totals
+        ]
+        LeaveBalance.objects.all().delete()
+        LeaveBalance.objects.bulk_create(snapshots, batch_size=2000)
+    return len(snapshots)
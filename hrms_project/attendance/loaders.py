@@ -0,0 +1,134 @@
+import csv
+import io
+from django.db import connection, transaction
+from .models import AttendanceRecord
+
+PUNCH_COLUMNS = [
+    'employee_id', 'timestamp', 'work_date', 'device_name', 'event_point',
+    'verify_type', 'event_description', 'remarks'
+]
+
+COPY_BATCH_SIZE = 10000
+
+STAGING_TABLE = 'attendance_punch_staging'
+
+def load_punches(rows):
+    """
+    Insert raw punches, skipping any (employee_id, timestamp) already stored.
+    rows: iterable of tuples in PUNCH_COLUMNS order with tz-aware timestamps
+    and the work_date each punch belongs to.
+    On PostgreSQL the rows are streamed with COPY into a temporary staging
+    table and moved with INSERT ... ON CONFLICT DO NOTHING RETURNING, so the
+    counts reflect what was actually written.
+    Returns: created_keys [(employee_id, timestamp, work_date)], duplicates
+    """
+    if connection.vendor == 'postgresql':
+        return _copy_punches(rows)
+    return _bulk_create_punches(rows)
+
+def _copy_punches(rows):
+    table = AttendanceRecord._meta.db_table
+    columns = ', '.join(PUNCH_COLUMNS)
+    total = 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS pg_temp.{STAGING_TABLE}')
+        cursor.execute(f'''
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                employee_id bigint NOT NULL,
+                timestamp timestamptz NOT NULL,
+                work_date date NOT NULL,
+                device_name varchar(100),
+                event_point varchar(100),
+                verify_type varchar(50),
+                event_description text,
+                remarks text
+            ) ON COMMIT DROP
+        ''')
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        batch = 0
+        for row in rows:
+            writer.writerow(_copy_row(row))
+            batch += 1
+            if batch >= COPY_BATCH_SIZE:
+                _flush_copy(cursor, buffer, columns)
+                total += batch
+                batch = 0
+        if batch:
+            _flush_copy(cursor, buffer, columns)
+            total += batch
+
+        if not total:
+            return [], 0
+
+        cursor.execute(f'''
+            INSERT INTO {table} ({columns}, is_active, created_at, updated_at)
+            SELECT DISTINCT ON (employee_id, timestamp)
+                employee_id, timestamp, work_date,
+                COALESCE(device_name, ''), COALESCE(event_point, ''),
+                COALESCE(verify_type, ''), event_description, remarks,
+                true, now(), now()
+            FROM {STAGING_TABLE}
+            ORDER BY employee_id, timestamp
+            ON CONFLICT (employee_id, timestamp) DO NOTHING
+            RETURNING employee_id, timestamp, work_date
+        ''')
+        created_keys = cursor.fetchall()
+
+    return created_keys, total - len(created_keys)
+
+def _copy_row(row):
+    return [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in row
+    ]
+
+def _flush_copy(cursor, buffer, columns):
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+    buffer.seek(0)
+    buffer.truncate()
+
+def get_existing_punch_keys(employee_ids, start, end):
+    """
+    Return {(employee_id, epoch_seconds)} for stored punches of the given
+    employees between start and end (inclusive). Only this window is read,
+    so the cost follows the uploaded file, not the whole punch history.
+    """
+    if not employee_ids:
+        return set()
+    return {
+        (employee_id, int(timestamp.timestamp()))
+        for employee_id, timestamp in AttendanceRecord.objects.filter(
+            employee_id__in=employee_ids,
+            timestamp__range=(start, end)
+        ).values_list('employee_id', 'timestamp').iterator(chunk_size=10000)
+    }
+
+def _bulk_create_punches(rows):
+    """Fallback for databases without COPY: window-scoped check plus bulk_create"""
+    rows = list(rows)
+    if not rows:
+        return [], 0
+
+    employee_ids = {row[0] for row in rows}
+    timestamps = [row[1] for row in rows]
+    existing_keys = get_existing_punch_keys(list(employee_ids), min(timestamps), max(timestamps))
+
+    records = []
+    created_keys = []
+    for row in rows:
+        values = dict(zip(PUNCH_COLUMNS, row))
+        key = (values['employee_id'], int(values['timestamp'].timestamp()))
+        if key in existing_keys:
+            continue
+        existing_keys.add(key)
+        for column in ('device_name', 'event_point', 'verify_type'):
+            values[column] = values[column] or ''
+        records.append(AttendanceRecord(**values))
+        created_keys.append((values['employee_id'], values['timestamp'], values['work_date']))
+
+    AttendanceRecord.objects.bulk_create(records, ignore_conflicts=True)
+    return created_keys, len(rows) - len(created_keys)
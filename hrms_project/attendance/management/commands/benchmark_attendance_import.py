@@ -0,0 +1,103 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from attendance.utils import process_attendance_excel
+from employees.models import Employee
+
+
+class Command(BaseCommand):
+    help = 'Benchmark attendance Excel ingestion (legacy row loop vs vectorized engine) in rows per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Number of punches to generate')
+        parser.add_argument('--employees', type=int, default=500, help='Number of distinct personnel IDs')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only benchmark the vectorized engine')
+
+    def handle(self, *args, **options):
+        rows, employee_count = options['rows'], options['employees']
+        df = self.generate_frame(rows, employee_count)
+
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            df.to_excel(path, index=False, engine='openpyxl')
+
+            if not options['skip_legacy']:
+                elapsed = self.run_rolled_back(lambda: self.legacy_import(path))
+                self.report('legacy iterrows', rows, elapsed)
+
+            elapsed = self.run_rolled_back(lambda: process_attendance_excel(path))
+            self.report('vectorized', rows, elapsed)
+        finally:
+            os.remove(path)
+
+    def generate_frame(self, rows, employee_count):
+        """Build a synthetic machine export with the same columns as the device"""
+        start = datetime(2025, 1, 1, 6, 0)
+        personnel_ids = [str(900000 + i) for i in range(employee_count)]
+        return pd.DataFrame({
+            'Date And Time': [
+                (start + timedelta(seconds=random.randrange(31 * 24 * 3600))).strftime('%Y-%m-%d %H:%M:%S')
+                for _ in range(rows)
+            ],
+            'Personnel ID': [random.choice(personnel_ids) for _ in range(rows)],
+            'Device Name': 'BENCH',
+            'Event Point': 'Door 1',
+            'Verify Type': 'Fingerprint',
+            'Event Description': 'Normal Punch Open',
+            'Remarks': '',
+        })
+
+    def run_rolled_back(self, func):
+        """Time func inside a transaction that is always rolled back"""
+        with transaction.atomic():
+            started = perf_counter()
+            func()
+            elapsed = perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
+
+    def report(self, label, rows, elapsed):
+        self.stdout.write(
+            self.style.SUCCESS(f'{label:>16}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)')
+        )
+
+    def legacy_import(self, path):
+        """The original per-row ingestion loop, kept only as the benchmark baseline"""
+        df = pd.read_excel(path, engine='openpyxl')
+        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+        existing_records = {
+            (str(r.employee_id), r.timestamp.strftime('%Y-%m-%d %H:%M:%S')): True
+            for r in AttendanceRecord.objects.all()
+        }
+        records_to_create = []
+        for _, row in df.iterrows():
+            timestamp = timezone.make_aware(pd.to_datetime(row['date_and_time']).to_pydatetime())
+            employee, _ = Employee.objects.get_or_create(
+                employee_number=str(row['personnel_id']),
+                defaults={'first_name': f"Employee {row['personnel_id']}", 'last_name': ''}
+            )
+            record_key = (str(employee.id), timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+            if record_key in existing_records:
+                continue
+            records_to_create.append(AttendanceRecord(
+                employee=employee,
+                timestamp=timestamp,
+                work_date=AttendanceRecord.get_work_date(timestamp),
+                device_name=row.get('device_name', ''),
+                event_point=row.get('event_point', ''),
+                verify_type=row.get('verify_type', ''),
+                event_description=row.get('event_description', ''),
+                remarks=row.get('remarks', '')
+            ))
+            existing_records[record_key] = True
+        AttendanceRecord.objects.bulk_create(records_to_create, ignore_conflicts=True)
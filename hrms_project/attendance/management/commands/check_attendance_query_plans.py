@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.http import urlencode
+from rest_framework.request import Request
+
+from attendance.models import AttendanceLog, AttendanceRecord, DailyAttendanceStatus, Leave
+from attendance.query_plans import analyze_guarded_tables, seed_plan_data, sequential_scans
+from attendance.utils import get_employees_on_leave
+from attendance.views import AttendanceLogListViewSet, LeaveViewSet
+
+
+def query_shapes():
+    """Yield (name, queryset or SQL) for the queries issued by the attendance views and utils"""
+    log = AttendanceLog.objects.order_by('-date').first()
+    day = log.date if log else timezone.localdate()
+    month_start = day.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    employee_id = log.employee_id if log else 0
+    department_id = (log.employee.department_id if log else None) or 0
+
+    yield 'log list (date range)', viewset_queryset(
+        AttendanceLogListViewSet, {'start_date': str(day - timedelta(days=6)), 'end_date': str(day)}
+    )[:400]
+    yield 'log list (department)', viewset_queryset(
+        AttendanceLogListViewSet, {'start_date': str(day), 'end_date': str(day), 'department': department_id}
+    )[:400]
+    yield 'calendar events (month)', AttendanceLog.objects.filter(
+        date__range=[month_start, month_end]
+    ).select_related('employee')
+    yield 'leave list (status)', viewset_queryset(LeaveViewSet, {'status': 'pending'})
+    yield 'approved leaves (range)', Leave.objects.filter(
+        is_active=True, status='approved', start_date__lte=month_end, end_date__gte=month_start
+    )
+    yield 'employees on leave', get_employees_on_leave(month_start, month_end)
+    yield 'leave overlap check', last_query_sql(Leave(
+        employee_id=employee_id, leave_type='annual', start_date=day, end_date=day, status='pending'
+    ).validate_constraints)
+    yield 'attendance summary', AttendanceLog.objects.filter(
+        employee_id=employee_id, date__range=(month_start, month_end), is_active=True
+    ).order_by('date')
+    yield 'absence report', DailyAttendanceStatus.objects.filter(
+        status='absent', date__range=(month_start, month_end)
+    ).select_related('employee')
+    yield 'daily rollup', AttendanceRecord.objects.for_work_dates(day).filter(
+        is_active=True
+    ).values('employee_id', 'work_date').annotate(
+        first_punch=Min('timestamp'), last_punch=Max('timestamp')
+    ).order_by()
+    yield 'attendance detail', AttendanceRecord.objects.for_work_dates(day).filter(
+        employee_id=employee_id, is_active=True
+    ).order_by('timestamp')
+
+
+def viewset_queryset(viewset_class, params):
+    """The queryset a viewset builds for a GET request with these query params"""
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(urlencode(params))
+    view = viewset_class()
+    view.request = Request(http_request)
+    view.format_kwarg = None
+    return view.get_queryset()
+
+
+def last_query_sql(function):
+    """The SQL (parameters inlined) of the last query function issues, for shapes built outside a queryset"""
+    statements = []
+
+    def capture(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        statements.append(connection.ops.last_executed_query(context['cursor'], sql, params))
+        return result
+
+    with connection.execute_wrapper(capture):
+        try:
+            function()
+        except ValidationError:
+            pass  # the query is what is checked, not its outcome
+    return statements[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the attendance hot-path query shapes, with sequential '
+        'scans disabled, and fail if any of them still needs one because no '
+        'index can serve it'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=300, help='Employees to seed')
+        parser.add_argument('--days', type=int, default=365, help='Days of attendance to seed')
+        parser.add_argument('--no-seed', action='store_true', help='Explain against the existing data only')
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if not options['no_seed']:
+                seed_plan_data(options['employees'], options['days'])
+            analyze_guarded_tables()
+
+            for name, query in query_shapes():
+                scans = sequential_scans(query)
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'{name}: Seq Scan on {", ".join(scans)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{name}: no sequential scan'))
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'Sequential scans in: {", ".join(failures)}')
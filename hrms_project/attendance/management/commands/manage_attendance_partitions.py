@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from attendance.partitions import (
+    create_partition, detach_partition, list_partitions, month_start
+)
+
+
+class Command(BaseCommand):
+    help = 'Pre-create future monthly partitions of the attendance punch table and detach old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Number of future months to have partitions for')
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Detach partitions older than this many months')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop detached partitions instead of keeping them as archive tables')
+
+    def handle(self, *args, **options):
+        current_month = month_start(timezone.localdate())
+
+        for offset in range(options['months_ahead'] + 1):
+            month = month_start(current_month, offset)
+            if create_partition(month):
+                self.stdout.write(self.style.SUCCESS(f'Created partition for {month:%Y-%m}'))
+
+        if options['retain_months'] is not None:
+            cutoff = month_start(current_month, -options['retain_months'])
+            for name, month in sorted(list_partitions().items(), key=lambda item: item[1]):
+                if month < cutoff:
+                    detach_partition(name, drop=options['drop'])
+                    action = 'Dropped' if options['drop'] else 'Detached'
+                    self.stdout.write(self.style.SUCCESS(f'{action} partition {name}'))
+
+        self.stdout.write(self.style.SUCCESS(f'{len(list_partitions())} monthly partitions attached'))
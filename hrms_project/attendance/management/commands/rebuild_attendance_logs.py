@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.utils import rebuild_attendance_logs
+
+
+class Command(BaseCommand):
+    help = 'Recompute system attendance logs from the raw punches for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First work date (YYYY-MM-DD), defaults to 30 days ago')
+        parser.add_argument('--end', help='Last work date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--days-per-batch', type=int, default=31,
+                            help='Number of days rolled up per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else timezone.localdate()
+            start = (
+                datetime.strptime(options['start'], '%Y-%m-%d').date()
+                if options['start'] else end - timedelta(days=30)
+            )
+        except ValueError:
+            raise CommandError('Dates must be given as YYYY-MM-DD')
+
+        total = 0
+        batch_start = start
+        while batch_start <= end:
+            batch_end = min(batch_start + timedelta(days=options['days_per_batch'] - 1), end)
+            written = rebuild_attendance_logs(batch_start, batch_end)
+            total += written
+            self.stdout.write(f'{batch_start} to {batch_end}: {written} logs')
+            batch_start = batch_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} attendance logs'))
@@ -0,0 +1,40 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.leave_balances import post_opening_balances, rebuild_leave_balances
+from attendance.models import Leave
+
+
+class Command(BaseCommand):
+    help = (
+        'Post any consumption missing from the leave ledger and recompute every '
+        'leave balance snapshot from the ledger. Run once after deploying the '
+        'leave ledger, with --opening for the balances employees start with.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--opening', action='append', default=[], metavar='LEAVE_TYPE=DAYS',
+            help='Opening balance posted to every active employee without one yet, e.g. annual=21 (repeatable)'
+        )
+        parser.add_argument('--as-of', type=date.fromisoformat, help='Effective date of the opening balances (default today)')
+
+    def handle(self, *args, **options):
+        leave_types = {leave_type for leave_type, _ in Leave.LEAVE_TYPES}
+        opening = {}
+        for value in options['opening']:
+            leave_type, _, days = value.partition('=')
+            if leave_type not in leave_types:
+                raise CommandError(f'Unknown leave type in --opening {value}')
+            try:
+                opening[leave_type] = Decimal(days)
+            except InvalidOperation:
+                raise CommandError(f'Invalid number of days in --opening {value}')
+
+        if opening:
+            posted = post_opening_balances(opening, options['as_of'])
+            self.stdout.write(f'Posted {posted} opening balances')
+        written = rebuild_leave_balances()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} leave balances'))
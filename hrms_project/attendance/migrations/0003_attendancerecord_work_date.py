@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_work_date(apps, schema_editor):
+    """Backfill work_date from timestamp in the site's local time zone"""
+    start_hour = getattr(settings, 'ATTENDANCE_WORKDAY_START_HOUR', 0)
+    schema_editor.execute(
+        "UPDATE attendance_attendancerecord "
+        "SET work_date = ((timestamp AT TIME ZONE %s) - make_interval(hours => %s))::date",
+        params=[settings.TIME_ZONE, start_hour]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='work_date',
+            field=models.DateField(editable=False, null=True, help_text='Local working day the punch belongs to, derived from timestamp'),
+        ),
+        migrations.RunPython(populate_work_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='work_date',
+            field=models.DateField(editable=False, help_text='Local working day the punch belongs to, derived from timestamp'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['employee', 'work_date'], name='attendance_record_emp_day_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancerecord_work_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['date', 'id'], name='attendance_log_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['employee', 'date'], include=('first_in_time', 'last_out_time', 'source'), name='attendance_log_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['work_date', 'employee'], include=('timestamp',), name='attendance_record_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'start_date'], name='attendance_leave_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'approved')), fields=['end_date', 'start_date', 'employee'], name='attendance_leave_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.9 on 2026-10-18 10:05
+
+from datetime import date
+
+from django.db import migrations
+
+TABLE = 'attendance_attendancerecord'
+ARCHIVE = f'{TABLE}_unpartitioned'
+MONTHS_AHEAD = 3
+
+
+def _month(value, months=0):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _rebuild(schema_editor, partitioned):
+    """
+    Recreate the punch table as a monthly RANGE partitioned table on
+    "timestamp" (or back to a plain table), copying rows, identity,
+    constraints and indexes under their original names.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT conname, pg_get_constraintdef(oid), contype
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+        ''', [TABLE])
+        constraints = cursor.fetchall()
+        cursor.execute('''
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+            )
+        ''', [TABLE, TABLE])
+        indexes = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {TABLE}')
+        first, last = cursor.fetchone()
+        cursor.execute(
+            'SELECT column_name FROM information_schema.columns WHERE table_name = %s ORDER BY ordinal_position',
+            [TABLE]
+        )
+        columns = ', '.join(f'"{row[0]}"' for row in cursor.fetchall())
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {ARCHIVE}')
+        partition_clause = 'PARTITION BY RANGE ("timestamp")' if partitioned else ''
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {ARCHIVE} INCLUDING DEFAULTS INCLUDING IDENTITY) {partition_clause}'
+        )
+
+        if partitioned:
+            today = date.today()
+            month = _month(first.date() if first else today)
+            end = _month(max(last.date() if last else today, today), MONTHS_AHEAD + 1)
+            while month < end:
+                cursor.execute(
+                    f'CREATE TABLE {TABLE}_y{month.year}m{month.month:02d} PARTITION OF {TABLE} '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    [month.isoformat(), _month(month, 1).isoformat()]
+                )
+                month = _month(month, 1)
+            cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {ARCHIVE}')
+        cursor.execute(f'DROP TABLE {ARCHIVE}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}",
+            [TABLE]
+        )
+
+        for name, definition, kind in constraints:
+            if kind == 'p':
+                # A primary key on a partitioned table must contain the partition key
+                definition = 'PRIMARY KEY (id, "timestamp")' if partitioned else 'PRIMARY KEY (id)'
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        for name, definition in indexes:
+            cursor.execute(definition)
+
+
+def partition_table(apps, schema_editor):
+    _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_table(apps, schema_editor):
+    _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
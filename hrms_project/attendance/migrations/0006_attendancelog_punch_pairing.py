@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_partition_attendancerecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancelog',
+            name='break_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='punch_intervals',
+            field=models.JSONField(blank=True, default=list, help_text='Paired IN/OUT punches of the day, computed by the rollup'),
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='worked_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
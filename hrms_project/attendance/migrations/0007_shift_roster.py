@@ -0,0 +1,72 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_alter_employeeoffence_details_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0006_attendancelog_punch_pairing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftRotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('anchor_date', models.DateField(help_text='Date on which the first step starts')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='early_leave_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='late_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ShiftRotationStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('days', models.PositiveSmallIntegerField(default=1)),
+                ('rotation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='attendance.shiftrotation')),
+                ('shift', models.ForeignKey(blank=True, help_text='Leave empty for days off', null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.shift')),
+            ],
+            options={
+                'ordering': ['rotation', 'order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, help_text='Leave empty for an open-ended assignment', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shift_assignments', to='employees.department')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shift_assignments', to='employees.employee')),
+                ('rotation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.shiftrotation')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.shift')),
+            ],
+            options={
+                'ordering': ['-start_date'],
+                'indexes': [models.Index(fields=['employee', 'start_date'], name='attendance_shift_emp_idx'), models.Index(fields=['department', 'start_date'], name='attendance_shift_dept_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_alter_employeeoffence_details_and_more'),
+        ('attendance', '0007_shift_roster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('late', 'Late'), ('absent', 'Absent'), ('leave', 'On Leave'), ('holiday', 'Holiday'), ('weekend', 'Weekend')], max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('attendance_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.attendancelog')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_statuses', to='employees.employee')),
+                ('leave', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.leave')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily attendance statuses',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['status', 'date'], name='attendance_daily_status_idx')],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
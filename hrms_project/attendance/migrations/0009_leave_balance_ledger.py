@@ -0,0 +1,59 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_alter_employeeoffence_details_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0008_daily_attendance_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leave_type', models.CharField(choices=[('annual', 'Annual Leave'), ('sick', 'Sick Leave'), ('permission', 'Permission')], max_length=20)),
+                ('accrued', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('used', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('adjusted', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to='employees.employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leave_type', models.CharField(choices=[('annual', 'Annual Leave'), ('sick', 'Sick Leave'), ('permission', 'Permission')], max_length=20)),
+                ('entry_type', models.CharField(choices=[('accrual', 'Accrual'), ('consumption', 'Consumption'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('effective_date', models.DateField()),
+                ('period', models.CharField(blank=True, help_text='Accrual month (YYYY-MM)', max_length=7)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leave_ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_ledger_entries', to='employees.employee')),
+                ('leave', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='attendance.leave')),
+            ],
+            options={
+                'verbose_name_plural': 'Leave ledger entries',
+                'ordering': ['-effective_date', '-id'],
+                'indexes': [models.Index(fields=['employee', 'leave_type', 'effective_date'], name='attendance_ledger_emp_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaveledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type', 'accrual')), fields=('employee', 'leave_type', 'period'), name='attendance_ledger_accrual_unique'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leavebalance',
+            unique_together={('employee', 'leave_type')},
+        ),
+    ]
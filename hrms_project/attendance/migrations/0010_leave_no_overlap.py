@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:59
+
+import attendance.models
+import django.contrib.postgres.constraints
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def check_existing_overlaps(apps, schema_editor):
+    """Name the overlapping leaves instead of failing on an opaque constraint error"""
+    Leave = apps.get_model('attendance', 'Leave')
+    active = Leave.objects.filter(is_active=True).exclude(status='rejected')
+    overlapping = active.filter(Exists(
+        active.filter(
+            employee=OuterRef('employee'),
+            start_date__lte=OuterRef('end_date'),
+            end_date__gte=OuterRef('start_date')
+        ).exclude(pk=OuterRef('pk'))
+    ))
+    leave_ids = list(overlapping.order_by('employee', 'start_date').values_list('id', flat=True)[:50])
+    if leave_ids:
+        raise RuntimeError(
+            f'Active leaves overlap for the same employee (ids {leave_ids}); '
+            'reject or deactivate the duplicates and run the migration again'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_leave_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='leave',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('is_active', True), models.Q(('status', 'rejected'), _negated=True)), expressions=[(attendance.models.EmployeeDaySpan('employee', 'start_date', 'end_date'), '&&')], name='attendance_leave_no_overlap', violation_error_message='The employee already has a leave overlapping these dates'),
+        ),
+    ]
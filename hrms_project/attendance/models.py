@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, RangeOperators
 from employees.models import Employee
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from datetime import datetime, time, timedelta
 
 class Shift(models.Model):
     name = models.CharField(max_length=100)
@@ -19,6 +22,126 @@ class Shift(models.Model):
     class Meta:
         ordering = ['start_time']
 
+class ShiftRotation(models.Model):
+    """A repeating sequence of shifts (and days off) starting from an anchor date"""
+    name = models.CharField(max_length=100)
+    anchor_date = models.DateField(help_text="Date on which the first step starts")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def shift_on(self, date):
+        """Shift of the rotation on a date, None for a day off"""
+        steps = list(self.steps.all())
+        cycle_days = sum(step.days for step in steps)
+        if not cycle_days:
+            return None
+        offset = (date - self.anchor_date).days % cycle_days
+        for step in steps:
+            if offset < step.days:
+                return step.shift
+            offset -= step.days
+        return None
+
+class ShiftRotationStep(models.Model):
+    rotation = models.ForeignKey(
+        ShiftRotation,
+        on_delete=models.CASCADE,
+        related_name='steps'
+    )
+    order = models.PositiveSmallIntegerField(default=0)
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Leave empty for days off"
+    )
+    days = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        ordering = ['rotation', 'order']
+
+    def __str__(self):
+        return f"{self.rotation} #{self.order}: {self.shift or 'Off'} x{self.days}"
+
+class ShiftAssignment(models.Model):
+    """Roster entry: an employee or a whole department works a shift or rotation over a date range"""
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='shift_assignments'
+    )
+    department = models.ForeignKey(
+        'employees.Department',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='shift_assignments'
+    )
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    rotation = models.ForeignKey(
+        ShiftRotation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True, help_text="Leave empty for an open-ended assignment")
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['employee', 'start_date'], name='attendance_shift_emp_idx'),
+            models.Index(fields=['department', 'start_date'], name='attendance_shift_dept_idx'),
+        ]
+
+    def __str__(self):
+        target = self.employee or self.department
+        return f"{target}: {self.shift or self.rotation} from {self.start_date}"
+
+    def clean(self):
+        if bool(self.employee_id) == bool(self.department_id):
+            raise ValidationError("Assign either an employee or a department")
+        if bool(self.shift_id) == bool(self.rotation_id):
+            raise ValidationError("Choose either a shift or a rotation")
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError("End date must be after start date")
+
+class AttendanceRecordQuerySet(models.QuerySet):
+    def for_work_dates(self, start_date, end_date=None):
+        """
+        Punches whose work_date falls in [start_date, end_date]. A matching
+        timestamp window (one day of slack each side) is added so that the
+        monthly timestamp partitions can be pruned.
+        """
+        end_date = end_date or start_date
+        return self.filter(
+            work_date__range=(start_date, end_date),
+            timestamp__gte=timezone.make_aware(datetime.combine(start_date - timedelta(days=1), time.min)),
+            timestamp__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=2), time.min))
+        )
+
 class AttendanceRecord(models.Model):
     """Raw attendance data from machine"""
     employee = models.ForeignKey(
@@ -27,6 +150,10 @@ class AttendanceRecord(models.Model):
         related_name='attendance_records'
     )
     timestamp = models.DateTimeField()
+    work_date = models.DateField(
+        editable=False,
+        help_text="Local working day the punch belongs to, derived from timestamp"
+    )
     device_name = models.CharField(max_length=100)
     event_point = models.CharField(max_length=100)
     verify_type = models.CharField(max_length=50)
@@ -36,13 +163,53 @@ class AttendanceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AttendanceRecordQuerySet.as_manager()
+
     class Meta:
+        # The table is RANGE partitioned by month on timestamp (migration 0005)
         unique_together = ['employee', 'timestamp']
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['employee', 'work_date'], name='attendance_record_emp_day_idx'),
+            # Daily rollup: active punches of a work_date range, MIN/MAX from the index
+            models.Index(
+                fields=['work_date', 'employee'],
+                include=['timestamp'],
+                condition=models.Q(is_active=True),
+                name='attendance_record_active_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.employee} - {self.timestamp}"
 
+    @staticmethod
+    def get_work_date(timestamp, employee_id=None):
+        """
+        Working day of a punch. A punch inside one of the employee's shift
+        windows belongs to that shift's date (night shifts included); other
+        punches use the local date, where punches before
+        ATTENDANCE_WORKDAY_START_HOUR count towards the previous day.
+        """
+        from .shifts import assign_work_date, build_shift_schedule, calendar_work_date
+
+        if employee_id is None:
+            return calendar_work_date(timestamp)
+        day = timezone.localtime(timestamp).date()
+        schedule = build_shift_schedule([employee_id], day - timedelta(days=1), day)
+        return assign_work_date(schedule, employee_id, timestamp)
+
+    def save(self, *args, **kwargs):
+        self.work_date = self.get_work_date(self.timestamp, self.employee_id)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored punch so edits can refresh the day it moved from
+        instance._loaded_punch = dict(zip(field_names, values))
+        return instance
+
 class AttendanceLog(models.Model):
     """Processed attendance data with first in/last out times"""
     employee = models.ForeignKey(
@@ -64,6 +231,15 @@ class AttendanceLog(models.Model):
         choices=[('system', 'System'), ('manual', 'Manual')],
         default='system'
     )
+    late_minutes = models.PositiveIntegerField(default=0)
+    early_leave_minutes = models.PositiveIntegerField(default=0)
+    punch_intervals = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Paired IN/OUT punches of the day, computed by the rollup"
+    )
+    worked_minutes = models.PositiveIntegerField(default=0)
+    break_minutes = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -76,6 +252,17 @@ class AttendanceLog(models.Model):
     class Meta:
         unique_together = ['employee', 'date']
         ordering = ['-date']
+        indexes = [
+            # Log list and calendar: date ranges ordered by -date
+            models.Index(fields=['date', 'id'], name='attendance_log_date_idx'),
+            # Attendance summary: one employee's active logs, answered index-only
+            models.Index(
+                fields=['employee', 'date'],
+                include=['first_in_time', 'last_out_time', 'source'],
+                condition=models.Q(is_active=True),
+                name='attendance_log_active_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.employee} - {self.date}"
@@ -106,6 +293,31 @@ class AttendanceEdit(models.Model):
     def __str__(self):
         return f"Edit on {self.attendance_log} at {self.edit_timestamp}"
 
+class EmployeeDaySpan(models.Func):
+    """
+    An employee's dates as one int8range of (employee, day) keys: the
+    employee id times 2**20 plus the days since 1900-01-01. Two spans overlap
+    only when both the employee and the dates do, so a plain GiST exclusion
+    on this range keeps each employee's spans apart without the btree_gist
+    extension an (employee WITH =) exclusion would need.
+    """
+    DAYS_PER_EMPLOYEE = 2 ** 20
+    output_field = BigIntegerRangeField()
+
+    def __init__(self, employee, start_date, end_date, **extra):
+        super().__init__(employee, start_date, end_date, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (employee, employee_params), (start, start_params), (end, end_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        def key(day):
+            return f"({employee})::bigint * {self.DAYS_PER_EMPLOYEE} + (({day}) - DATE '1900-01-01')"
+        return (
+            f"int8range({key(start)}, {key(end)}, '[]')",
+            (*employee_params, *start_params, *employee_params, *end_params)
+        )
+
 class Leave(models.Model):
     LEAVE_TYPES = [
         ('annual', 'Annual Leave'),
@@ -142,6 +354,33 @@ class Leave(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Leave list filtered by status
+            models.Index(
+                fields=['status', 'start_date'],
+                condition=models.Q(is_active=True),
+                name='attendance_leave_status_idx'
+            ),
+            # Approved leaves overlapping a date range
+            models.Index(
+                fields=['end_date', 'start_date', 'employee'],
+                condition=models.Q(is_active=True, status='approved'),
+                name='attendance_leave_approved_idx'
+            ),
+        ]
+        constraints = [
+            # An employee's active, non-rejected leaves may not share a day
+            ExclusionConstraint(
+                name='attendance_leave_no_overlap',
+                expressions=[
+                    (EmployeeDaySpan('employee', 'start_date', 'end_date'), RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(is_active=True) & ~models.Q(status='rejected'),
+                violation_error_message='The employee already has a leave overlapping these dates'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.employee} - {self.leave_type} ({self.start_date} to {self.end_date})"
 
@@ -150,9 +389,107 @@ class Leave(models.Model):
             if self.start_date > self.end_date:
                 raise ValidationError("End date cannot be before start date")
 
+    def validate_balance(self):
+        """
+        Raise a ValidationError if saving would take an accruing leave type's
+        balance below zero, the same rule bulk approvals follow. Locks the
+        balances it reads, so call it inside the transaction that saves.
+        """
+        from .leave_balances import leave_balance_errors, leave_consumption_entries
+
+        errors = leave_balance_errors([self], leave_consumption_entries([self]))
+        if errors:
+            raise ValidationError(errors[self.pk])
+
     def save(self, *args, **kwargs):
+        from .leave_balances import sync_leave_consumption
+
         self.full_clean()
-        super().save(*args, **kwargs)
+        # The ledger and balance follow the leave in the same transaction
+        with transaction.atomic():
+            self.validate_balance()
+            super().save(*args, **kwargs)
+            sync_leave_consumption(self)
+
+class LeaveLedgerEntry(models.Model):
+    """
+    One movement of an employee's leave balance, in days: positive for
+    accruals, negative for consumption, either sign for adjustments
+    """
+    ENTRY_TYPES = [
+        ('accrual', 'Accrual'),
+        ('consumption', 'Consumption'),
+        ('adjustment', 'Adjustment')
+    ]
+
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='leave_ledger_entries'
+    )
+    leave_type = models.CharField(max_length=20, choices=Leave.LEAVE_TYPES)
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=7, decimal_places=2)
+    effective_date = models.DateField()
+    period = models.CharField(
+        max_length=7,
+        blank=True,
+        help_text="Accrual month (YYYY-MM)"
+    )
+    leave = models.ForeignKey(
+        Leave,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    remarks = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='leave_ledger_entries'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-effective_date', '-id']
+        verbose_name_plural = 'Leave ledger entries'
+        indexes = [
+            models.Index(fields=['employee', 'leave_type', 'effective_date'], name='attendance_ledger_emp_idx'),
+        ]
+        constraints = [
+            # A month is accrued once per employee and leave type
+            models.UniqueConstraint(
+                fields=['employee', 'leave_type', 'period'],
+                condition=models.Q(entry_type='accrual'),
+                name='attendance_ledger_accrual_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.leave_type} {self.entry_type} {self.amount}"
+
+class LeaveBalance(models.Model):
+    """Running leave balance per employee and leave type, kept in step with the ledger"""
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='leave_balances'
+    )
+    leave_type = models.CharField(max_length=20, choices=Leave.LEAVE_TYPES)
+    accrued = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    used = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    adjusted = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['employee', 'leave_type']
+
+    def __str__(self):
+        return f"{self.employee} - {self.leave_type}: {self.balance}"
 
 class Holiday(models.Model):
     date = models.DateField(unique=True)
@@ -170,4 +507,88 @@ class Holiday(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"{self.date} - {self.description}"
\ No newline at end of file
+        return f"{self.date} - {self.description}"
+
+class DailyAttendanceStatus(models.Model):
+    """
+    One row per active employee and day, materialized from AttendanceLog,
+    approved leaves and holidays so absences can be filtered directly
+    """
+    STATUS_CHOICES = [
+        ('present', 'Present'),
+        ('late', 'Late'),
+        ('absent', 'Absent'),
+        ('leave', 'On Leave'),
+        ('holiday', 'Holiday'),
+        ('weekend', 'Weekend')
+    ]
+
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='daily_statuses'
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    attendance_log = models.ForeignKey(
+        AttendanceLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    leave = models.ForeignKey(
+        Leave,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['employee', 'date']
+        ordering = ['-date']
+        verbose_name_plural = 'Daily attendance statuses'
+        indexes = [
+            # Absence and status reports: one status over a date range
+            models.Index(fields=['status', 'date'], name='attendance_daily_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date} ({self.status})"
+
+class ImportJob(models.Model):
+    """Background import of an attendance machine export"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed')
+    ]
+
+    file = models.FileField(upload_to='attendance_imports/%Y/%m/')
+    original_filename = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_parsed = models.PositiveIntegerField(default=0)
+    records_created = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    total_records = models.PositiveIntegerField(default=0)
+    logs_created = models.PositiveIntegerField(default=0)
+    new_employees = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='attendance_import_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.original_filename or self.file.name} ({self.status})"
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+def get_debounce_seconds():
+    """Punches this close to the previous one are repeated scans (ATTENDANCE_PUNCH_DEBOUNCE_SECONDS)"""
+    return getattr(settings, 'ATTENDANCE_PUNCH_DEBOUNCE_SECONDS', 120)
+
+def pair_punches(timestamps, debounce_seconds=None):
+    """
+    Turn one working day's punches into IN/OUT intervals.
+    Repeated scans within debounce_seconds are dropped, the remaining punches
+    are paired in order (IN, OUT, IN, OUT, ...) and the gaps between
+    intervals are breaks. An odd last punch opens an interval without an
+    OUT. An interval may run past midnight into the next calendar day; the
+    minutes after midnight are reported as overnight.
+    Returns a dict with intervals, worked_minutes and break_minutes.
+    """
+    if debounce_seconds is None:
+        debounce_seconds = get_debounce_seconds()
+
+    punches = []
+    for timestamp in sorted(timestamps):
+        if punches and (timestamp - punches[-1]).total_seconds() < debounce_seconds:
+            continue
+        punches.append(timestamp)
+
+    intervals = []
+    worked = timedelta()
+    breaks = timedelta()
+    for index in range(0, len(punches), 2):
+        check_in = punches[index]
+        check_out = punches[index + 1] if index + 1 < len(punches) else None
+        interval = {
+            'in': timezone.localtime(check_in).isoformat(),
+            'out': timezone.localtime(check_out).isoformat() if check_out else None,
+            'minutes': 0,
+            'overnight_minutes': 0
+        }
+        if check_out:
+            duration = check_out - check_in
+            worked += duration
+            interval['minutes'] = int(duration.total_seconds() // 60)
+            midnight = timezone.localtime(check_in).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            if check_out > midnight:
+                interval['overnight_minutes'] = int((check_out - midnight).total_seconds() // 60)
+        if intervals:
+            breaks += check_in - punches[index - 1]
+        intervals.append(interval)
+
+    return {
+        'intervals': intervals,
+        'worked_minutes': int(worked.total_seconds() // 60),
+        'break_minutes': int(breaks.total_seconds() // 60)
+    }
+
+def punch_types(intervals):
+    """Map each paired punch time (ISO string) to 'IN' or 'OUT'"""
+    types = {}
+    for interval in intervals:
+        types[interval['in']] = 'IN'
+        if interval['out']:
+            types[interval['out']] = 'OUT'
+    return types
@@ -0,0 +1,71 @@
+from datetime import date
+from django.db import connection, transaction
+from .models import AttendanceRecord
+
+PARENT_TABLE = AttendanceRecord._meta.db_table
+
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+
+def month_start(value, months=0):
+    """First day of the month `months` away from value's month"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_y{month.year}m{month.month:02d}'
+
+def list_child_tables(parents):
+    """Return {partition_name: parent_table} for every partition attached to the given tables"""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT child.relname, parent.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = ANY(%s)
+        ''', [list(parents)])
+        return dict(cursor.fetchall())
+
+def list_partitions():
+    """Return {partition_name: month_start} for the monthly partitions attached to the punch table"""
+    partitions = {}
+    for name in list_child_tables([PARENT_TABLE]):
+        suffix = name[len(PARENT_TABLE) + 1:]
+        if suffix.startswith('y') and 'm' in suffix:
+            year, month = suffix[1:].split('m')
+            partitions[name] = date(int(year), int(month), 1)
+    return partitions
+
+def create_partition(month):
+    """
+    Create the partition for one month. Rows for that month that already
+    landed in the default partition are moved into it.
+    Returns False if the partition already exists.
+    """
+    name = partition_name(month)
+    if name in list_partitions():
+        return False
+
+    bounds = [month.isoformat(), month_start(month, 1).isoformat()]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)')
+        cursor.execute(f'''
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE "timestamp" >= %s::date AND "timestamp" < %s::date
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        ''', bounds)
+        cursor.execute(
+            f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            bounds
+        )
+    return True
+
+def detach_partition(name, drop=False):
+    """Detach a monthly partition from the punch table, keeping it as an archive table unless drop"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}')
+        if drop:
+            cursor.execute(f'DROP TABLE {name}')
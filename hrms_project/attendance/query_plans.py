@@ -0,0 +1,99 @@
+import json
+import random
+from datetime import datetime, time, timedelta
+from django.db import connection
+from django.utils import timezone
+from employees.models import Department, Employee
+from .models import AttendanceLog, AttendanceRecord, DailyAttendanceStatus, Leave
+from .partitions import list_child_tables
+from .utils import materialize_daily_status
+
+# Tables that must never be read with a sequential scan by the hot paths
+GUARDED_TABLES = {
+    AttendanceLog._meta.db_table,
+    AttendanceRecord._meta.db_table,
+    Leave._meta.db_table,
+    DailyAttendanceStatus._meta.db_table,
+}
+
+def analyze_guarded_tables():
+    """Refresh the planner statistics of the guarded tables (partitions included)"""
+    with connection.cursor() as cursor:
+        for table in GUARDED_TABLES:
+            cursor.execute(f'ANALYZE {table}')
+
+def sequential_scans(query):
+    """
+    Names of the guarded tables (or their partitions) the plan of a queryset
+    or SQL reads with a Seq Scan. Sequential scans are disabled while the
+    plan is made, so the planner only falls back to one when no index can
+    serve the query: the result does not depend on how much data the tables
+    hold or on their statistics.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            if isinstance(query, str):
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {query}')
+                plan = cursor.fetchone()[0]
+            else:
+                plan = json.loads(query.explain(format='json'))
+        finally:
+            cursor.execute('RESET enable_seqscan')
+    # Scans of a partitioned table are reported under its partitions' names
+    guarded = {table: table for table in GUARDED_TABLES}
+    guarded.update(list_child_tables(GUARDED_TABLES))
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in guarded:
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+def seed_plan_data(employee_count, days, seed=0):
+    """Generate departments, employees, punches, logs, leaves and daily statuses in bulk"""
+    rng = random.Random(seed)
+    departments = Department.objects.bulk_create([
+        Department(name=f'Plan Check {i}', code=f'PLANCHK{i}') for i in range(10)
+    ])
+    employees = Employee.objects.bulk_create([
+        Employee(
+            employee_number=f'PLAN{i:05d}',
+            first_name='Plan',
+            last_name=f'Check {i}',
+            department=departments[i % len(departments)]
+        )
+        for i in range(employee_count)
+    ])
+
+    first_day = timezone.localdate() - timedelta(days=days)
+    records, logs, leaves = [], [], []
+    for employee in employees:
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            check_in = timezone.make_aware(datetime.combine(day, time(7, rng.randrange(60))))
+            check_out = check_in + timedelta(hours=9, minutes=rng.randrange(60))
+            for timestamp in (check_in, check_out):
+                records.append(AttendanceRecord(
+                    employee=employee, timestamp=timestamp, work_date=day,
+                    device_name='PLAN', event_point='', verify_type=''
+                ))
+            logs.append(AttendanceLog(
+                employee=employee, date=day,
+                first_in_time=timezone.localtime(check_in).time(),
+                last_out_time=timezone.localtime(check_out).time()
+            ))
+        for offset in range(0, days, 30):
+            start = first_day + timedelta(days=offset)
+            leaves.append(Leave(
+                employee=employee, leave_type='annual', start_date=start,
+                end_date=start + timedelta(days=2),
+                status='pending' if rng.random() < 0.05 else 'approved'
+            ))
+
+    AttendanceRecord.objects.bulk_create(records, batch_size=5000)
+    AttendanceLog.objects.bulk_create(logs, batch_size=5000)
+    Leave.objects.bulk_create(leaves, batch_size=5000)
+    materialize_daily_status(first_day, timezone.localdate(), [employee.id for employee in employees])
@@ -1,8 +1,12 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from .models import (
-    Shift, AttendanceRecord, AttendanceLog,
-    AttendanceEdit, Leave, Holiday
+    Shift, ShiftRotation, ShiftRotationStep, ShiftAssignment,
+    AttendanceRecord, AttendanceLog, AttendanceEdit, Leave, LeaveLedgerEntry, Holiday, DailyAttendanceStatus, ImportJob
 )
+from .utils import full_name_expression
 from employees.models import Employee
 
 class ShiftSerializer(serializers.ModelSerializer):
@@ -10,6 +14,56 @@ class ShiftSerializer(serializers.ModelSerializer):
         model = Shift
         fields = '__all__'
 
+class ShiftRotationStepSerializer(serializers.ModelSerializer):
+    shift_name = serializers.CharField(source='shift.name', read_only=True, default=None)
+
+    class Meta:
+        model = ShiftRotationStep
+        fields = ['id', 'order', 'shift', 'shift_name', 'days']
+
+class ShiftRotationSerializer(serializers.ModelSerializer):
+    steps = ShiftRotationStepSerializer(many=True)
+
+    class Meta:
+        model = ShiftRotation
+        fields = '__all__'
+
+    def create(self, validated_data):
+        steps = validated_data.pop('steps', [])
+        rotation = ShiftRotation.objects.create(**validated_data)
+        ShiftRotationStep.objects.bulk_create([
+            ShiftRotationStep(rotation=rotation, **step) for step in steps
+        ])
+        return rotation
+
+    def update(self, instance, validated_data):
+        steps = validated_data.pop('steps', None)
+        instance = super().update(instance, validated_data)
+        if steps is not None:
+            instance.steps.all().delete()
+            ShiftRotationStep.objects.bulk_create([
+                ShiftRotationStep(rotation=instance, **step) for step in steps
+            ])
+        return instance
+
+class ShiftAssignmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShiftAssignment
+        fields = '__all__'
+        read_only_fields = ['created_by', 'created_at']
+
+    def validate(self, data):
+        instance = ShiftAssignment(**{
+            **({field.name: getattr(self.instance, field.name) for field in ShiftAssignment._meta.concrete_fields}
+               if self.instance else {}),
+            **data
+        })
+        try:
+            instance.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return data
+
 class AttendanceRecordSerializer(serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
 
@@ -42,6 +96,53 @@ class AttendanceLogSerializer(serializers.ModelSerializer):
     def get_personnel_id(self, obj):
         return obj.employee.employee_number if obj.employee else None
 
+class AttendanceLogListSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for AttendanceLog lists. Works on the dicts produced
+    by values_queryset(), where the related names are resolved by the
+    database, and emits the same JSON shape as AttendanceLogSerializer.
+    """
+    date_field = serializers.DateField()
+    time_field = serializers.TimeField()
+    datetime_field = serializers.DateTimeField()
+
+    @staticmethod
+    def values_queryset(queryset):
+        """Return queryset as dicts with employee_name, shift_name and personnel_id annotated"""
+        return queryset.annotate(
+            employee_name=full_name_expression('employee__'),
+            shift_name=F('shift__name'),
+            personnel_id=F('employee__employee_number')
+        ).values(
+            'id', 'employee_name', 'shift_name', 'employee_id', 'personnel_id',
+            'date', 'first_in_time', 'last_out_time', 'source', 'late_minutes',
+            'early_leave_minutes', 'punch_intervals', 'worked_minutes', 'break_minutes',
+            'is_active', 'created_at', 'shift_id', 'created_by_id'
+        )
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'employee_name': row['employee_name'],
+            'shift_name': row['shift_name'],
+            'employee_id': row['employee_id'],
+            'personnel_id': row['personnel_id'],
+            'date': self.date_field.to_representation(row['date']),
+            'first_in_time': self.time_field.to_representation(row['first_in_time']),
+            'last_out_time': self.time_field.to_representation(row['last_out_time']),
+            'source': row['source'],
+            'late_minutes': row['late_minutes'],
+            'early_leave_minutes': row['early_leave_minutes'],
+            'punch_intervals': row['punch_intervals'],
+            'worked_minutes': row['worked_minutes'],
+            'break_minutes': row['break_minutes'],
+            'is_active': row['is_active'],
+            'created_at': self.datetime_field.to_representation(row['created_at']),
+            'employee': row['employee_id'],
+            'shift': row['shift_id'],
+            'created_by': row['created_by_id'],
+        }
+
 class AttendanceEditSerializer(serializers.ModelSerializer):
     edited_by_name = serializers.SerializerMethodField()
 
@@ -66,6 +167,31 @@ class LeaveSerializer(serializers.ModelSerializer):
     def get_approved_by_name(self, obj):
         return obj.approved_by.get_full_name() if obj.approved_by else None
 
+    def validate(self, data):
+        instance = Leave(**{
+            **({field.name: getattr(self.instance, field.name) for field in Leave._meta.concrete_fields}
+               if self.instance else {}),
+            **data
+        })
+        # An update must not be reported as overlapping itself
+        instance._state.adding = self.instance is None
+        try:
+            instance.clean()
+            instance.validate_constraints()
+            with transaction.atomic():
+                instance.validate_balance()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return data
+
+class LeaveLedgerEntrySerializer(serializers.ModelSerializer):
+    """Ledger entries are read-only history; only adjustments are created through the API"""
+
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = '__all__'
+        read_only_fields = ['entry_type', 'period', 'leave', 'created_by', 'created_at']
+
 class HolidaySerializer(serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
 
@@ -76,9 +202,31 @@ class HolidaySerializer(serializers.ModelSerializer):
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
 
+class DailyAttendanceStatusSerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
+    personnel_id = serializers.CharField(source='employee.employee_number', read_only=True)
+    department = serializers.CharField(source='employee.department.name', read_only=True, default=None)
+
+    class Meta:
+        model = DailyAttendanceStatus
+        fields = [
+            'id', 'employee', 'employee_name', 'personnel_id', 'department',
+            'date', 'status', 'attendance_log', 'leave', 'updated_at'
+        ]
+
 class AttendanceUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        exclude = ['file']
+        read_only_fields = [
+            'original_filename', 'status', 'rows_parsed', 'records_created',
+            'duplicates', 'total_records', 'logs_created', 'new_employees',
+            'error', 'created_by', 'created_at', 'started_at', 'finished_at'
+        ]
+
 class BulkAttendanceCreateSerializer(serializers.Serializer):
     records = serializers.ListField(
         child=serializers.DictField()
@@ -0,0 +1,210 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+import numpy as np
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from employees.models import Employee
+from .models import Shift, ShiftAssignment, ShiftRotationStep
+
+# One shift instance: punches between start and end belong to work_date,
+# shift_start and shift_end are the scheduled times
+ShiftWindow = namedtuple('ShiftWindow', ['start', 'end', 'work_date', 'shift_id', 'shift_start', 'shift_end'])
+
+def get_window_margins():
+    """How far before a shift's start and after its end punches still count towards it"""
+    return (
+        timedelta(minutes=getattr(settings, 'ATTENDANCE_SHIFT_WINDOW_BEFORE_MINUTES', 240)),
+        timedelta(minutes=getattr(settings, 'ATTENDANCE_SHIFT_WINDOW_AFTER_MINUTES', 360)),
+    )
+
+def get_default_shift():
+    """The shift from ATTENDANCE_DEFAULT_SHIFT_ID, applied to everyone until a roster exists"""
+    shift_id = getattr(settings, 'ATTENDANCE_DEFAULT_SHIFT_ID', None)
+    if not shift_id:
+        return None
+    return Shift.objects.filter(id=shift_id, is_active=True).first()
+
+def shift_bounds(shift, work_date):
+    """Scheduled start and end of a shift on a work date; night shifts end the next day"""
+    start = timezone.make_aware(datetime.combine(work_date, shift.start_time))
+    end = timezone.make_aware(datetime.combine(work_date, shift.end_time))
+    if shift.is_night_shift or end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+class RosterIntervals:
+    """One target's roster assignments sorted by start date, for bisect lookups"""
+
+    def __init__(self, assignments):
+        self.assignments = sorted(assignments, key=lambda assignment: assignment.start_date)
+        self.starts = [assignment.start_date for assignment in self.assignments]
+
+    def assignment_on(self, date):
+        """The assignment covering date that started last, or None"""
+        index = bisect_right(self.starts, date) - 1
+        while index >= 0:
+            assignment = self.assignments[index]
+            if assignment.end_date is None or assignment.end_date >= date:
+                return assignment
+            index -= 1
+        return None
+
+def resolve_shifts(employee_ids, start_date, end_date):
+    """
+    Which shift applies to each employee on each date of the range: the
+    employee's own roster assignment first, then their department's, then
+    ATTENDANCE_DEFAULT_SHIFT_ID. Where assignments overlap, the one that
+    started last wins. The roster is loaded once for the whole range.
+    Returns: {employee_id: {date: Shift}}; days without a shift are left out
+    """
+    employee_ids = list(employee_ids)
+    departments = dict(Employee.objects.filter(id__in=employee_ids).values_list('id', 'department_id'))
+    department_ids = {department_id for department_id in departments.values() if department_id}
+    assignments = ShiftAssignment.objects.filter(
+        Q(employee_id__in=employee_ids) | Q(department_id__in=department_ids),
+        Q(end_date__isnull=True) | Q(end_date__gte=start_date),
+        is_active=True,
+        start_date__lte=end_date
+    ).select_related('shift', 'rotation').prefetch_related(
+        Prefetch('rotation__steps', queryset=ShiftRotationStep.objects.select_related('shift'))
+    )
+
+    by_target = {}
+    for assignment in assignments:
+        target = ('employee', assignment.employee_id) if assignment.employee_id else ('department', assignment.department_id)
+        by_target.setdefault(target, []).append(assignment)
+    rosters = {target: RosterIntervals(items) for target, items in by_target.items()}
+    default_shift = get_default_shift()
+    if not rosters and default_shift is None:
+        return {}
+
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    resolved = {}
+    for employee_id in employee_ids:
+        own = rosters.get(('employee', employee_id))
+        department = rosters.get(('department', departments.get(employee_id)))
+        shifts = {}
+        for day in days:
+            assignment = (own and own.assignment_on(day)) or (department and department.assignment_on(day))
+            if assignment is None:
+                shift = default_shift
+            elif assignment.rotation_id:
+                shift = assignment.rotation.shift_on(day)
+            else:
+                shift = assignment.shift
+            if shift is not None and shift.is_active:
+                shifts[day] = shift
+        if shifts:
+            resolved[employee_id] = shifts
+    return resolved
+
+class EmployeeSchedule:
+    """An employee's shift windows over a date range, sorted for bisect lookups"""
+
+    def __init__(self, windows):
+        self.windows = sorted(windows, key=lambda window: window.start)
+        self.starts = [window.start for window in self.windows]
+        self.by_date = {window.work_date: window for window in self.windows}
+
+    def as_arrays(self):
+        """
+        Window starts and ends, scheduled shift starts and ends (all epoch
+        nanoseconds) and work dates as NumPy arrays
+        """
+        if not hasattr(self, '_arrays'):
+            self._arrays = tuple(
+                np.array([int(getattr(window, field).timestamp()) * 10**9 for window in self.windows], dtype=np.int64)
+                for field in ('start', 'end', 'shift_start', 'shift_end')
+            ) + (np.array([window.work_date for window in self.windows], dtype=object),)
+        return self._arrays
+
+    def window_for(self, timestamp):
+        """
+        The window containing timestamp, or None. Where the margins of two
+        consecutive windows overlap (e.g. a night shift's end and the next
+        day shift's start), the window whose scheduled shift is nearest to
+        the punch wins, the earlier one on a tie.
+        """
+        index = bisect_right(self.starts, timestamp) - 1
+        candidates = [
+            window for window in self.windows[max(index - 1, 0):index + 1]
+            if window.start <= timestamp <= window.end
+        ]
+        return min(candidates, key=lambda window: _distance_to_shift(window, timestamp), default=None)
+
+def _distance_to_shift(window, timestamp):
+    """How far timestamp falls outside the scheduled shift of a window, zero inside it"""
+    return max(window.shift_start - timestamp, timestamp - window.shift_end, timedelta())
+
+def build_shift_schedule(employee_ids, start_date, end_date):
+    """
+    Precompute the shift windows of many employees for the punches of a
+    date range. Shifts are resolved once for the whole range (with a day of
+    margin each side) and no query is made per punch.
+    Returns: {employee_id: EmployeeSchedule}
+    """
+    before, after = get_window_margins()
+    assignments = resolve_shifts(employee_ids, start_date - timedelta(days=1), end_date + timedelta(days=1))
+    bounds = {}
+    schedule = {}
+    for employee_id, shifts in assignments.items():
+        windows = []
+        for day, shift in shifts.items():
+            if (shift.id, day) not in bounds:
+                bounds[(shift.id, day)] = shift_bounds(shift, day)
+            start, end = bounds[(shift.id, day)]
+            windows.append(ShiftWindow(start - before, end + after, day, shift.id, start, end))
+        schedule[employee_id] = EmployeeSchedule(windows)
+    return schedule
+
+def calendar_work_date(timestamp):
+    """Work date without a shift: the local date, shifted by ATTENDANCE_WORKDAY_START_HOUR"""
+    start_hour = getattr(settings, 'ATTENDANCE_WORKDAY_START_HOUR', 0)
+    return (timezone.localtime(timestamp) - timedelta(hours=start_hour)).date()
+
+def assign_work_date(schedule, employee_id, timestamp):
+    """Work date of one punch: its shift window's date, else the calendar rule"""
+    employee_schedule = schedule.get(employee_id)
+    window = employee_schedule.window_for(timestamp) if employee_schedule else None
+    return window.work_date if window else calendar_work_date(timestamp)
+
+def assign_frame_work_dates(employee_ids, timestamps, calendar_dates):
+    """
+    Vectorized assign_work_date for an import chunk.
+    employee_ids, timestamps (tz-aware) and calendar_dates are aligned pandas
+    Series; calendar_dates already holds the calendar rule result and is
+    overridden wherever a punch falls inside a shift window.
+    """
+    if employee_ids.empty:
+        return calendar_dates
+    schedule = build_shift_schedule(
+        employee_ids.unique().tolist(), calendar_dates.min(), calendar_dates.max()
+    )
+    if not schedule:
+        return calendar_dates
+
+    work_dates = calendar_dates.copy()
+    epoch_ns = timestamps.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    for employee_id, positions in employee_ids.groupby(employee_ids).indices.items():
+        employee_schedule = schedule.get(employee_id)
+        if employee_schedule is None or not employee_schedule.windows:
+            continue
+        starts, ends, shift_starts, shift_ends, dates = employee_schedule.as_arrays()
+        punch_ns = epoch_ns[positions]
+        index = np.searchsorted(starts, punch_ns, side='right') - 1
+        previous = index - 1
+        inside = (index >= 0) & (punch_ns <= ends[np.maximum(index, 0)])
+        inside_previous = (previous >= 0) & (punch_ns <= ends[np.maximum(previous, 0)])
+
+        def distance(candidates):
+            candidates = np.maximum(candidates, 0)
+            return np.maximum(np.maximum(shift_starts[candidates] - punch_ns, punch_ns - shift_ends[candidates]), 0)
+
+        # The previous window, still open, wins where its shift is as near as the latest started one's
+        use_previous = inside_previous & (~inside | (distance(previous) <= distance(index)))
+        chosen = np.where(use_previous, previous, index)
+        found = inside | inside_previous
+        work_dates.iloc[positions[found]] = dates[chosen[found]]
+    return work_dates
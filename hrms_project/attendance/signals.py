@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from employees.models import Employee
+from .cache import EMPLOYEES, bump_data_version, bump_named_version
+from .leave_balances import sync_leave_consumption
+from .models import (
+    AttendanceRecord, AttendanceLog, Leave, Holiday, Shift, ShiftAssignment, ShiftRotation, ShiftRotationStep
+)
+from .utils import log_delete_signals_are_muted, materialize_daily_status, recompute_attendance_logs
+from .working_days import invalidate_working_calendars
+
+@receiver(post_save, sender=AttendanceRecord)
+def refresh_log_on_punch_save(sender, instance, **kwargs):
+    """Recompute the attendance log(s) of a punch saved through the ORM"""
+    touched = {(instance.employee_id, instance.work_date)}
+    loaded = getattr(instance, '_loaded_punch', {})
+    if loaded.get('employee_id') and loaded.get('work_date'):
+        touched.add((loaded['employee_id'], loaded['work_date']))
+    recompute_attendance_logs(touched)
+
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_log_on_punch_delete(sender, instance, **kwargs):
+    recompute_attendance_logs({(instance.employee_id, instance.work_date)})
+
+def _date_range(instance):
+    """Dates an attendance log, leave or holiday covers, as (start, end)"""
+    if isinstance(instance, Leave):
+        return instance.start_date, instance.end_date
+    return instance.date, instance.date
+
+@receiver(pre_save, sender=AttendanceLog)
+@receiver(pre_save, sender=Leave)
+@receiver(pre_save, sender=Holiday)
+def remember_cached_dates(sender, instance, **kwargs):
+    """Keep the stored dates so a change of date also invalidates the old month"""
+    instance._cached_dates = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous:
+            instance._cached_dates = _date_range(previous)
+
+@receiver(post_save, sender=AttendanceLog)
+@receiver(post_save, sender=Leave)
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=AttendanceLog)
+@receiver(post_delete, sender=Leave)
+@receiver(post_delete, sender=Holiday)
+def invalidate_cached_months(sender, instance, signal, **kwargs):
+    """Bump the cache data version of the months the changed row covers"""
+    if signal is post_delete and sender is AttendanceLog and log_delete_signals_are_muted():
+        return
+    start_date, end_date = _date_range(instance)
+    if start_date and end_date:
+        bump_data_version(start_date, end_date)
+    previous = getattr(instance, '_cached_dates', None)
+    if previous and previous != (start_date, end_date):
+        bump_data_version(*previous)
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_cached_employees(sender, instance, **kwargs):
+    """Employee fields appear in the responses of every month; bump the version they all share"""
+    bump_named_version(EMPLOYEES)
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def rebuild_working_calendars(sender, instance, **kwargs):
+    """Holidays feed the working calendars; drop them before anything reads the change"""
+    invalidate_working_calendars()
+
+@receiver(post_save, sender=AttendanceLog)
+@receiver(post_save, sender=Leave)
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=AttendanceLog)
+@receiver(post_delete, sender=Leave)
+@receiver(post_delete, sender=Holiday)
+def refresh_daily_status(sender, instance, signal, **kwargs):
+    """Re-materialize the daily statuses of the days the changed row covers"""
+    if signal is post_delete and sender is AttendanceLog and log_delete_signals_are_muted():
+        return
+    employee_ids = None if isinstance(instance, Holiday) else [instance.employee_id]
+    ranges = {_date_range(instance), getattr(instance, '_cached_dates', None)}
+    for start_date, end_date in filter(None, ranges):
+        if start_date and end_date:
+            materialize_daily_status(start_date, end_date, employee_ids)
+
+@receiver(pre_delete, sender=Leave)
+def reverse_leave_consumption(sender, instance, **kwargs):
+    """Give back the days a deleted leave consumed, before its ledger entries lose the link"""
+    sync_leave_consumption(instance, removed=True)
+
+# Fields of the roster models that decide which shift window a punch falls in
+_ROSTER_FIELDS = {
+    ShiftAssignment: ('employee_id', 'department_id', 'shift_id', 'rotation_id', 'start_date', 'end_date', 'is_active'),
+    Shift: ('start_time', 'end_time', 'is_night_shift', 'is_active'),
+    ShiftRotation: ('anchor_date', 'is_active'),
+    ShiftRotationStep: ('rotation_id', 'order', 'shift_id', 'days'),
+}
+
+@receiver(pre_save, sender=ShiftAssignment)
+@receiver(pre_save, sender=Shift)
+@receiver(pre_save, sender=ShiftRotation)
+@receiver(pre_save, sender=ShiftRotationStep)
+def remember_roster_fields(sender, instance, **kwargs):
+    """Keep the stored roster fields, so an edit also rebuilds what the old values decided"""
+    instance._roster_previous = None
+    if instance.pk:
+        instance._roster_previous = sender.objects.filter(pk=instance.pk).values(*_ROSTER_FIELDS[sender]).first()
+
+def _roster_changed(instance, created):
+    """Whether a save created the row or changed one of its roster fields"""
+    previous = getattr(instance, '_roster_previous', None)
+    if created or previous is None:
+        return True
+    return any(getattr(instance, field) != value for field, value in previous.items())
+
+def _assignment_scopes(assignments):
+    """(employee_id, department_id, start_date, end_date) of the days each assignment decides"""
+    return [
+        (assignment['employee_id'], assignment['department_id'], assignment['start_date'], assignment['end_date'])
+        for assignment in assignments.values('employee_id', 'department_id', 'start_date', 'end_date')
+    ]
+
+def _queue_roster_rebuild(scopes):
+    """
+    Queue one rebuild, up to today, covering the union of the scopes. A scope
+    without employee and department is everyone's (the default shift) and
+    starts at the first stored punch when it has no start_date.
+    """
+    from .tasks import rebuild_attendance_range
+
+    today = timezone.localdate()
+    scopes = [scope for scope in scopes if scope[2] is None or scope[2] <= today]
+    if not scopes:
+        return
+    start_date = min((scope[2] for scope in scopes if scope[2]), default=None)
+    if any(scope[2] is None for scope in scopes):
+        start_date = AttendanceRecord.objects.aggregate(first=Min('work_date'))['first']
+        if start_date is None:
+            return
+    end_date = min(max(scope[3] or today for scope in scopes), today)
+
+    if any(not employee_id and not department_id for employee_id, department_id, _, _ in scopes):
+        employee_ids = None
+    else:
+        employee_ids = {employee_id for employee_id, _, _, _ in scopes if employee_id}
+        department_ids = {department_id for employee_id, department_id, _, _ in scopes if not employee_id}
+        if department_ids:
+            employee_ids.update(Employee.objects.filter(
+                department_id__in=department_ids
+            ).values_list('id', flat=True))
+        employee_ids = sorted(employee_ids)
+    transaction.on_commit(lambda: rebuild_attendance_range.delay(
+        start_date.isoformat(), end_date.isoformat(), employee_ids
+    ))
+
+@receiver(post_save, sender=ShiftAssignment)
+@receiver(post_delete, sender=ShiftAssignment)
+def rebuild_logs_on_roster_change(sender, instance, signal, created=False, **kwargs):
+    """Queue a rebuild of the days whose shift the assignment decides, before and after an edit"""
+    if signal is post_save and not _roster_changed(instance, created):
+        return
+    scopes = [(instance.employee_id, instance.department_id, instance.start_date, instance.end_date)]
+    previous = getattr(instance, '_roster_previous', None)
+    if signal is post_save and previous:
+        scopes.append((
+            previous['employee_id'], previous['department_id'], previous['start_date'], previous['end_date']
+        ))
+    _queue_roster_rebuild(scopes)
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+def rebuild_logs_on_shift_change(sender, instance, signal, created=False, **kwargs):
+    """
+    Queue a rebuild of the days worked on a changed shift: those of the
+    assignments using it directly or through a rotation, and everyone's when
+    it is the default shift. Deleting a shift deletes its assignments and
+    rotation steps first, whose own signals rebuild their days.
+    """
+    if signal is post_save and (created or not _roster_changed(instance, created)):
+        return
+    scopes = _assignment_scopes(ShiftAssignment.objects.filter(
+        Q(shift_id=instance.id) | Q(rotation__steps__shift_id=instance.id)
+    ).distinct())
+    if str(instance.id) == str(getattr(settings, 'ATTENDANCE_DEFAULT_SHIFT_ID', None)):
+        scopes.append((None, None, None, None))
+    _queue_roster_rebuild(scopes)
+
+@receiver(post_save, sender=ShiftRotation)
+def rebuild_logs_on_rotation_change(sender, instance, created=False, **kwargs):
+    """Queue a rebuild of the days of the assignments following a changed rotation"""
+    if created or not _roster_changed(instance, created):
+        return
+    _queue_roster_rebuild(_assignment_scopes(ShiftAssignment.objects.filter(rotation_id=instance.id)))
+
+@receiver(post_save, sender=ShiftRotationStep)
+@receiver(post_delete, sender=ShiftRotationStep)
+def rebuild_logs_on_rotation_step_change(sender, instance, signal, created=False, **kwargs):
+    """Queue a rebuild of the days of the assignments following the rotation of a changed step"""
+    if signal is post_save and not _roster_changed(instance, created):
+        return
+    rotation_ids = {instance.rotation_id}
+    previous = getattr(instance, '_roster_previous', None)
+    if signal is post_save and previous:
+        rotation_ids.add(previous['rotation_id'])
+    _queue_roster_rebuild(_assignment_scopes(ShiftAssignment.objects.filter(rotation_id__in=rotation_ids)))
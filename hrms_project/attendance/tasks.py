@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from django.conf import settings
+from celery import shared_task
+from django.utils import timezone
+from .leave_balances import accrue_monthly_leave
+from .models import ImportJob
+from .utils import (
+    import_attendance_file, materialize_daily_status, rebuild_attendance_logs
+)
+
+@shared_task
+def run_attendance_import(job_id):
+    """Import an uploaded attendance file, rebuilding the affected daily logs chunk by chunk"""
+    job = ImportJob.objects.get(id=job_id)
+    ImportJob.objects.filter(id=job_id).update(status='running', started_at=timezone.now())
+
+    def report_progress(rows_parsed, records_created, duplicates):
+        ImportJob.objects.filter(id=job_id).update(
+            rows_parsed=rows_parsed,
+            records_created=records_created,
+            duplicates=duplicates
+        )
+
+    try:
+        with job.file.open('rb') as excel_file:
+            result = import_attendance_file(excel_file, progress=report_progress)
+
+        ImportJob.objects.filter(id=job_id).update(
+            status='completed',
+            rows_parsed=result['rows_parsed'],
+            records_created=result['records_created'],
+            duplicates=result['duplicates'],
+            total_records=result['total_records'],
+            logs_created=result['logs_created'],
+            new_employees=result['new_employees'],
+            finished_at=timezone.now()
+        )
+    except Exception as e:
+        ImportJob.objects.filter(id=job_id).update(
+            status='failed',
+            error=str(e),
+            finished_at=timezone.now()
+        )
+    finally:
+        # The upload is only read by the job; drop it once the job has finished either way
+        job.file.delete(save=False)
+        ImportJob.objects.filter(id=job_id).update(file='')
+
+@shared_task
+def rebuild_attendance_range(start_date, end_date, employee_ids=None, days_per_batch=31):
+    """
+    Re-derive work dates and rebuild logs for a date range, e.g. after a
+    roster change, one batch of days (and transaction) at a time so a range
+    reaching years back never loads all of its punches at once
+    """
+    end_date = date.fromisoformat(end_date)
+    batch_start = date.fromisoformat(start_date)
+    written = 0
+    while batch_start <= end_date:
+        batch_end = min(batch_start + timedelta(days=days_per_batch - 1), end_date)
+        written += rebuild_attendance_logs(batch_start, batch_end, employee_ids)
+        batch_start = batch_end + timedelta(days=1)
+    return written
+
+@shared_task
+def materialize_recent_daily_status(days=None):
+    """
+    Nightly refresh of the daily statuses of the last days up to today
+    (ATTENDANCE_DAILY_STATUS_DAYS), picking up new days, new and departed
+    employees and late corrections
+    """
+    if days is None:
+        days = getattr(settings, 'ATTENDANCE_DAILY_STATUS_DAYS', 7)
+    today = timezone.localdate()
+    return materialize_daily_status(today - timedelta(days=days - 1), today)
+
+@shared_task
+def post_monthly_leave_accruals(month=None):
+    """Monthly leave accrual for all employees; month is an ISO date within the month, this month by default"""
+    return accrue_monthly_leave(date.fromisoformat(month) if month else None)
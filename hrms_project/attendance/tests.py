@@ -0,0 +1,573 @@
+import os
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import (
+    AttendanceLog, AttendanceRecord, DailyAttendanceStatus, Holiday, ImportJob, Leave, LeaveLedgerEntry, Shift,
+    ShiftAssignment, ShiftRotation, ShiftRotationStep
+)
+from attendance.cache import cached_response, get_cache_stats
+from attendance.leave_balances import get_leave_balances, post_opening_balances
+from attendance.management.commands.check_attendance_query_plans import query_shapes
+from attendance.pairing import pair_punches
+from attendance.query_plans import seed_plan_data, sequential_scans
+from attendance.shifts import EmployeeSchedule, RosterIntervals, ShiftWindow, assign_frame_work_dates, assign_work_date
+from attendance.tasks import rebuild_attendance_range, run_attendance_import
+from attendance.utils import (
+    build_attendance_matrix, bulk_update_leave_status, get_attendance_summaries, get_calendar_summary, get_day_attendance,
+    materialize_daily_status, rebuild_attendance_logs, recompute_attendance_logs
+)
+from attendance.working_days import WorkingCalendar, get_holidays_version, get_working_calendar
+from employees.models import Department, Employee
+
+
+class QueryPlanTests(TestCase):
+    """The attendance hot paths must be served by indexes, never by sequential scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_plan_data(employee_count=5, days=10)
+
+    def test_hot_paths_avoid_sequential_scans(self):
+        for name, query in query_shapes():
+            with self.subTest(name):
+                self.assertEqual(sequential_scans(query), [])
+
+    def test_unindexed_filters_are_reported(self):
+        self.assertEqual(
+            sequential_scans(AttendanceLog.objects.filter(break_minutes=30).order_by()), [AttendanceLog._meta.db_table]
+        )
+
+
+class PairPunchesTests(SimpleTestCase):
+    def punch(self, day, hour, minute=0, second=0):
+        return timezone.make_aware(datetime(2026, 3, day, hour, minute, second))
+
+    def test_pairs_in_order_with_breaks(self):
+        result = pair_punches([
+            self.punch(1, 13), self.punch(1, 8), self.punch(1, 17), self.punch(1, 12)
+        ], debounce_seconds=120)
+        self.assertEqual([interval['minutes'] for interval in result['intervals']], [240, 240])
+        self.assertEqual(result['worked_minutes'], 480)
+        self.assertEqual(result['break_minutes'], 60)
+
+    def test_repeated_scans_are_debounced(self):
+        result = pair_punches([
+            self.punch(1, 8), self.punch(1, 8, 0, 30), self.punch(1, 8, 1, 59), self.punch(1, 17)
+        ], debounce_seconds=120)
+        self.assertEqual(len(result['intervals']), 1)
+        self.assertEqual(result['worked_minutes'], 540)
+
+    def test_debounce_compares_against_the_last_kept_punch(self):
+        # 08:01:30 is within 120s of 08:00 and dropped; 08:03 is 180s after 08:00 and kept
+        result = pair_punches([
+            self.punch(1, 8), self.punch(1, 8, 1, 30), self.punch(1, 8, 3)
+        ], debounce_seconds=120)
+        self.assertEqual(result['worked_minutes'], 3)
+
+    def test_odd_last_punch_opens_an_interval(self):
+        result = pair_punches([self.punch(1, 8), self.punch(1, 12), self.punch(1, 13)], debounce_seconds=0)
+        self.assertEqual(len(result['intervals']), 2)
+        self.assertIsNone(result['intervals'][1]['out'])
+        self.assertEqual(result['intervals'][1]['minutes'], 0)
+        self.assertEqual(result['worked_minutes'], 240)
+        self.assertEqual(result['break_minutes'], 60)
+
+    def test_overnight_minutes_past_midnight(self):
+        result = pair_punches([self.punch(1, 22), self.punch(2, 6, 30)], debounce_seconds=0)
+        interval = result['intervals'][0]
+        self.assertEqual(interval['minutes'], 510)
+        self.assertEqual(interval['overnight_minutes'], 390)
+
+    def test_no_punches(self):
+        self.assertEqual(pair_punches([], debounce_seconds=0), {
+            'intervals': [], 'worked_minutes': 0, 'break_minutes': 0
+        })
+
+
+class WorkingCalendarTests(TestCase):
+    WEEKEND_DAYS = (4, 5)
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        first_day = date(2025, 1, 1)
+        cls.holidays = {first_day + timedelta(days=rng.randrange(3 * 365)) for _ in range(40)}
+        cls.holidays |= {date(2026, 12, 31), date(2027, 1, 1)}
+        Holiday.objects.bulk_create([
+            Holiday(date=day, description='Test holiday') for day in sorted(cls.holidays)
+        ])
+
+    def setUp(self):
+        self.calendar = WorkingCalendar(self.WEEKEND_DAYS)
+
+    def is_working(self, day):
+        return day.weekday() not in self.WEEKEND_DAYS and day not in self.holidays
+
+    def test_matches_brute_force_over_random_ranges(self):
+        rng = random.Random(1)
+        first_day = date(2024, 12, 1)
+        for _ in range(2000):
+            start = first_day + timedelta(days=rng.randrange(3 * 365))
+            end = start + timedelta(days=rng.randrange(500))
+            days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+            expected_mask = [self.is_working(day) for day in days]
+
+            self.assertEqual(self.calendar.working_days_between(start, end), sum(expected_mask))
+            self.assertEqual(self.calendar.working_mask(start, end).tolist(), expected_mask)
+            self.assertEqual(
+                self.calendar.holidays_between(start, end),
+                {day for day in self.holidays if start <= day <= end}
+            )
+            expected_next = start + timedelta(days=1)
+            while not self.is_working(expected_next):
+                expected_next += timedelta(days=1)
+            self.assertEqual(self.calendar.next_working_day(start), expected_next)
+
+    def test_next_working_day_crosses_the_year_boundary(self):
+        # Thursday 2026-12-31 and Friday 2027-01-01 are holidays, Friday and Saturday the weekend
+        self.assertEqual(self.calendar.next_working_day(date(2026, 12, 30)), date(2027, 1, 3))
+        self.assertEqual(self.calendar.next_working_day(date(2026, 12, 31)), date(2027, 1, 3))
+
+    def test_empty_and_single_day_ranges(self):
+        self.assertEqual(self.calendar.working_days_between(date(2026, 3, 2), date(2026, 3, 1)), 0)
+        self.assertEqual(len(self.calendar.working_mask(date(2026, 3, 2), date(2026, 3, 1))), 0)
+        day = date(2026, 3, 6)  # a Friday
+        self.assertFalse(self.calendar.is_working_day(day))
+        self.assertEqual(self.calendar.working_days_between(day, day), 0)
+
+    def test_inactive_holidays_are_working_days(self):
+        day = date(2026, 3, 2)  # a Monday
+        Holiday.objects.filter(date=day).delete()
+        Holiday.objects.bulk_create([Holiday(date=day, description='Cancelled', is_active=False)])
+        self.assertTrue(WorkingCalendar(self.WEEKEND_DAYS).is_working_day(day))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_sees_holidays_saved_elsewhere(self):
+        day = date(2026, 3, 3)  # a Tuesday
+        Holiday.objects.filter(date=day).delete()
+        self.assertTrue(get_working_calendar().is_working_day(day))
+        # As if saved by another process: no version bump reaches this one
+        Holiday.objects.bulk_create([Holiday(date=day, description='Added elsewhere')])
+        self.assertFalse(get_working_calendar().is_working_day(day))
+
+
+# Nothing listens on port 1, so every cache call fails with a connection error
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:1/0'
+}})
+class CacheUnavailableTests(TestCase):
+    def tearDown(self):
+        caches['default'].close()
+
+    def test_responses_are_built_uncached(self):
+        build = mock.Mock(return_value={'rows': []})
+        params = QueryDict('department=1')
+        with self.assertLogs('attendance.cache', 'WARNING'):
+            for _ in range(2):
+                self.assertEqual(
+                    cached_response('logs', params, date(2026, 3, 1), date(2026, 3, 31), build), {'rows': []}
+                )
+        self.assertEqual(build.call_count, 2)
+        self.assertIsNone(get_cache_stats())
+
+    def test_holidays_version_falls_back_to_the_database(self):
+        day = date(2026, 3, 4)  # a Wednesday
+        with self.assertLogs('attendance.cache', 'WARNING'):
+            version = get_holidays_version()
+            self.assertIsNotNone(version)
+            with self.captureOnCommitCallbacks(execute=True):
+                Holiday.objects.create(date=day, description='Saved without a cache')
+            self.assertNotEqual(get_holidays_version(), version)
+            self.assertFalse(get_working_calendar().is_working_day(day))
+
+
+@mock.patch('attendance.cache.is_shared_cache', return_value=True)
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_employee_changes_invalidate_every_month(self, _):
+        employee = Employee.objects.create(employee_number='CACHE001', first_name='Cache', last_name='Check')
+        build = mock.Mock(return_value={'rows': []})
+        params = QueryDict('search=cache')
+        cached_response('logs', params, date(2025, 1, 1), date(2025, 1, 31), build)
+        cached_response('logs', params, date(2025, 1, 1), date(2025, 1, 31), build)
+        self.assertEqual(build.call_count, 1)
+
+        employee.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        cached_response('logs', params, date(2025, 1, 1), date(2025, 1, 31), build)
+        self.assertEqual(build.call_count, 2)
+
+
+class RosterIntervalsTests(SimpleTestCase):
+    def assignment(self, name, start_date, end_date=None):
+        return SimpleNamespace(name=name, start_date=start_date, end_date=end_date)
+
+    def test_latest_started_assignment_wins_where_they_overlap(self):
+        roster = RosterIntervals([
+            self.assignment('temporary', date(2026, 3, 10), date(2026, 3, 20)),
+            self.assignment('base', date(2026, 1, 1)),
+        ])
+        self.assertIsNone(roster.assignment_on(date(2025, 12, 31)))
+        self.assertEqual(roster.assignment_on(date(2026, 3, 9)).name, 'base')
+        self.assertEqual(roster.assignment_on(date(2026, 3, 10)).name, 'temporary')
+        self.assertEqual(roster.assignment_on(date(2026, 3, 20)).name, 'temporary')
+        # Once the later assignment ends, the earlier open-ended one applies again
+        self.assertEqual(roster.assignment_on(date(2026, 3, 21)).name, 'base')
+
+    def test_gap_between_bounded_assignments(self):
+        roster = RosterIntervals([
+            self.assignment('first', date(2026, 3, 1), date(2026, 3, 5)),
+            self.assignment('second', date(2026, 3, 10), date(2026, 3, 15)),
+        ])
+        self.assertIsNone(roster.assignment_on(date(2026, 3, 7)))
+        self.assertIsNone(roster.assignment_on(date(2026, 3, 16)))
+
+
+class AssignWorkDateTests(SimpleTestCase):
+    def setUp(self):
+        # A night shift 22:00-06:00 on March 1st and 2nd for employee 1, nothing for employee 2
+        before, after = timedelta(hours=4), timedelta(hours=6)
+        windows = []
+        for day in (date(2026, 3, 1), date(2026, 3, 2)):
+            start = timezone.make_aware(datetime.combine(day, time(22)))
+            end = start + timedelta(hours=8)
+            windows.append(ShiftWindow(start - before, end + after, day, 1, start, end))
+        self.schedule = {1: EmployeeSchedule(windows)}
+
+    def punch(self, day, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 3, day, hour, minute))
+
+    def test_overnight_punches_take_the_shift_date(self):
+        self.assertEqual(assign_work_date(self.schedule, 1, self.punch(1, 21, 50)), date(2026, 3, 1))
+        self.assertEqual(assign_work_date(self.schedule, 1, self.punch(2, 5, 30)), date(2026, 3, 1))
+        self.assertEqual(assign_work_date(self.schedule, 1, self.punch(3, 6, 10)), date(2026, 3, 2))
+
+    def test_punches_outside_any_window_use_the_calendar_date(self):
+        self.assertEqual(assign_work_date(self.schedule, 1, self.punch(2, 14)), date(2026, 3, 2))
+        self.assertEqual(assign_work_date(self.schedule, 2, self.punch(2, 5, 30)), date(2026, 3, 2))
+
+    def test_overlapping_windows_prefer_the_nearest_shift(self):
+        # A day shift 08:00-16:00 on March 2nd: its window opens at 04:00, while the night window is still open
+        start = timezone.make_aware(datetime(2026, 3, 2, 8))
+        end = timezone.make_aware(datetime(2026, 3, 2, 16))
+        self.schedule = {1: EmployeeSchedule(self.schedule[1].windows[:1] + [
+            ShiftWindow(start - timedelta(hours=4), end + timedelta(hours=6), date(2026, 3, 2), 2, start, end)
+        ])}
+        punches = [self.punch(2, 4, 30), self.punch(2, 6, 10), self.punch(2, 6, 59), self.punch(2, 7, 50), self.punch(2, 11)]
+        expected = [date(2026, 3, 1), date(2026, 3, 1), date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 2)]
+        self.assertEqual([assign_work_date(self.schedule, 1, punch) for punch in punches], expected)
+
+        calendar_dates = pd.Series([punch.date() for punch in punches])
+        with mock.patch('attendance.shifts.build_shift_schedule', return_value=self.schedule):
+            work_dates = assign_frame_work_dates(pd.Series([1] * len(punches)), pd.Series(punches), calendar_dates)
+        self.assertEqual(work_dates.tolist(), expected)
+
+    def test_frame_assignment_matches_the_scalar_rule(self):
+        punches = [
+            (1, self.punch(1, 21, 50)), (2, self.punch(2, 5, 30)), (1, self.punch(2, 5, 30)),
+            (1, self.punch(2, 14)), (1, self.punch(3, 6, 10)), (2, self.punch(3, 23)),
+        ]
+        employee_ids = pd.Series([employee_id for employee_id, _ in punches])
+        timestamps = pd.Series([timestamp for _, timestamp in punches])
+        calendar_dates = timestamps.dt.date
+        with mock.patch('attendance.shifts.build_shift_schedule', return_value=self.schedule):
+            work_dates = assign_frame_work_dates(employee_ids, timestamps, calendar_dates)
+        self.assertEqual(work_dates.tolist(), [
+            assign_work_date(self.schedule, employee_id, timestamp) for employee_id, timestamp in punches
+        ])
+
+
+class ReassignWorkDatesTests(TestCase):
+    def test_out_punch_moves_into_a_night_shift_ending_the_range(self):
+        employee = Employee.objects.create(employee_number='NIGHT001', first_name='Night', last_name='Shift')
+        shift = Shift.objects.create(name='Night', start_time=time(22), end_time=time(6), is_night_shift=True)
+        # Stored by the calendar rule before the roster existed: the out-punch sits on March 11th
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(employee=employee, timestamp=timestamp, work_date=timestamp.date())
+            for timestamp in (
+                timezone.make_aware(datetime(2026, 3, 10, 21, 55)),
+                timezone.make_aware(datetime(2026, 3, 11, 5, 30)),
+            )
+        ])
+        ShiftAssignment.objects.bulk_create([ShiftAssignment(
+            employee=employee, shift=shift, start_date=date(2026, 3, 10), end_date=date(2026, 3, 10)
+        )])
+
+        rebuild_attendance_logs(date(2026, 3, 10), date(2026, 3, 10), [employee.id])
+
+        self.assertEqual(
+            set(AttendanceRecord.objects.filter(employee=employee).values_list('work_date', flat=True)),
+            {date(2026, 3, 10)}
+        )
+        self.assertEqual(
+            list(AttendanceLog.objects.filter(employee=employee).values_list('date', 'worked_minutes')),
+            [(date(2026, 3, 10), 455)]
+        )
+
+
+class RecomputeAttendanceLogsTests(TestCase):
+    def test_only_the_changed_days_are_rematerialized(self):
+        employee = Employee.objects.create(employee_number='TOUCH001', first_name='Touched', last_name='Days')
+        punches = AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(employee=employee, timestamp=timestamp, work_date=timestamp.date())
+            for timestamp in (
+                timezone.make_aware(datetime(2026, 3, 2, 8)), timezone.make_aware(datetime(2026, 3, 2, 17)),
+                timezone.make_aware(datetime(2026, 3, 9, 8)), timezone.make_aware(datetime(2026, 3, 9, 17)),
+            )
+        ])
+        rebuild_attendance_logs(date(2026, 3, 2), date(2026, 3, 9), [employee.id])
+        self.assertEqual(DailyAttendanceStatus.objects.filter(employee=employee).count(), 2)
+
+        AttendanceRecord.objects.filter(id__in=[punch.id for punch in punches[2:]]).update(is_active=False)
+        touched = {(employee.id, date(2026, 3, 2)), (employee.id, date(2026, 3, 9))}
+        with mock.patch('attendance.utils.materialize_daily_status', wraps=materialize_daily_status) as materialize:
+            recompute_attendance_logs(touched)
+        # One call for the batch, none from the deleted log's post_delete
+        materialize.assert_called_once_with(date(2026, 3, 2), date(2026, 3, 9), {employee.id}, only=touched)
+        self.assertEqual(
+            dict(DailyAttendanceStatus.objects.filter(employee=employee).values_list('date', 'status')),
+            {date(2026, 3, 2): 'present', date(2026, 3, 9): 'absent'}
+        )
+
+
+class JoinedDateTests(TestCase):
+    """Days before an employee joined are never counted as absent"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = Employee.objects.create(
+            employee_number='JOIN001', first_name='New', last_name='Hire', joined_date=date(2026, 3, 16)
+        )
+        AttendanceLog.objects.bulk_create([AttendanceLog(
+            employee=cls.employee, date=date(2026, 3, 17), first_in_time=time(8), last_out_time=time(17)
+        )])
+        cls.start_date, cls.end_date = date(2026, 3, 1), date(2026, 3, 31)
+        calendar = get_working_calendar()
+        cls.expected_absent = calendar.working_days_between(date(2026, 3, 16), cls.end_date) - 1
+
+    def test_daily_status_starts_on_joined_date(self):
+        DailyAttendanceStatus.objects.bulk_create([DailyAttendanceStatus(
+            employee=self.employee, date=date(2026, 3, 2), status='absent'
+        )])
+        materialize_daily_status(self.start_date, self.end_date, [self.employee.id])
+        statuses = DailyAttendanceStatus.objects.filter(employee=self.employee)
+        self.assertEqual(min(statuses.values_list('date', flat=True)), date(2026, 3, 16))
+        self.assertEqual(statuses.filter(status='absent').count(), self.expected_absent)
+
+    def test_summary_counts_from_joined_date(self):
+        summary, = get_attendance_summaries([self.employee.id], self.start_date, self.end_date)
+        self.assertEqual(summary['absent_days'], self.expected_absent)
+        self.assertEqual(summary['working_days'], self.expected_absent + 1)
+
+    def test_matrix_has_no_data_before_joined_date(self):
+        matrix = build_attendance_matrix(Employee.objects.filter(id=self.employee.id), self.start_date, self.end_date)
+        row, = matrix['status']
+        self.assertEqual(row[:15], '-' * 15)
+        self.assertEqual(row.count('A'), self.expected_absent)
+
+
+class CalendarSummaryTests(TestCase):
+    """The calendar summary and day drill-down agree with the materialized daily statuses"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.start_date, cls.end_date = date(2026, 3, 1), date(2026, 3, 31)
+        department = Department.objects.create(name='Calendar', code='CAL')
+        # The last one has left: their logs must not count
+        employees = Employee.objects.bulk_create([
+            Employee(
+                employee_number=f'CAL{i:03d}', first_name='Calendar', last_name=str(i),
+                department=department, is_active=i < 6
+            )
+            for i in range(7)
+        ])
+        employees[0].joined_date = date(2026, 3, 12)
+        employees[0].save()
+        Holiday.objects.bulk_create([Holiday(date=date(2026, 3, 18), description='Test holiday')])
+        AttendanceLog.objects.bulk_create([
+            AttendanceLog(employee=employee, date=day, first_in_time=time(8, 5 * i), last_out_time=time(17))
+            for i, employee in enumerate(employees)
+            for day in (date(2026, 3, 2), date(2026, 3, 6), date(2026, 3, 16), date(2026, 3, 24))
+            if (i + day.day) % 3
+        ])
+        # Spans a weekend and the holiday
+        Leave.objects.bulk_create([Leave(
+            employee=employees[1], leave_type='annual', start_date=date(2026, 3, 17),
+            end_date=date(2026, 3, 21), status='approved'
+        )])
+        materialize_daily_status(cls.start_date, cls.end_date)
+        cls.statuses = {
+            (row.employee_id, row.date): row.status
+            for row in DailyAttendanceStatus.objects.filter(employee__in=employees)
+        }
+
+    def test_daily_totals_match_the_daily_statuses(self):
+        for day in get_calendar_summary(self.start_date, self.end_date):
+            with self.subTest(day['date']):
+                statuses = [status for (_, date_), status in self.statuses.items() if date_ == day['date']]
+                self.assertEqual(day['totals']['absent'], statuses.count('absent'))
+                self.assertEqual(day['totals']['on_leave'], statuses.count('leave'))
+                self.assertEqual(
+                    day['totals']['present'], statuses.count('present') + statuses.count('late')
+                )
+
+    def test_day_drill_down_matches_the_daily_statuses(self):
+        expected = {'present': 'present', 'late': 'late', 'absent': 'absent', 'leave': 'on_leave'}
+        for day in (date(2026, 3, 6), date(2026, 3, 10), date(2026, 3, 18), date(2026, 3, 19), date(2026, 3, 20)):
+            with self.subTest(day):
+                for row in get_day_attendance(day):
+                    status = self.statuses.get((row['employee_id'], day))
+                    self.assertEqual(row['status'], expected.get(status))
+
+
+class LeaveBalanceRuleTests(TestCase):
+    """Single and bulk approvals refuse to take an accruing balance below zero"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='approver', password='approver')
+        cls.employee = Employee.objects.create(employee_number='BAL001', first_name='Balance', last_name='Check')
+        # Monday to Friday, 4 working days with the Friday weekend
+        cls.leave = Leave.objects.create(
+            employee=cls.employee, leave_type='annual', start_date=date(2026, 3, 2), end_date=date(2026, 3, 6),
+            approved_by=cls.user
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def approve(self):
+        return self.client.patch(
+            f'/attendance/api/leaves/{self.leave.id}/', {'status': 'approved'}, content_type='application/json'
+        )
+
+    def test_single_approval_over_balance_is_refused(self):
+        response = self.approve()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient annual balance', str(response.data))
+        self.leave.status = 'approved'
+        with self.assertRaises(ValidationError):
+            self.leave.save()
+        self.assertFalse(LeaveLedgerEntry.objects.filter(leave=self.leave).exists())
+
+    def test_bulk_and_single_approvals_follow_the_opening_balance(self):
+        result, = bulk_update_leave_status([self.leave.id], 'approved', self.user)
+        self.assertEqual(result['result'], 'error')
+
+        self.assertEqual(post_opening_balances({'annual': 4}), 1)
+        self.assertEqual(post_opening_balances({'annual': 4}), 0)
+        self.assertEqual(self.approve().status_code, 200)
+        self.assertEqual(get_leave_balances(self.employee.id)['annual']['remaining'], 0)
+
+
+@mock.patch('attendance.tasks.rebuild_attendance_range.delay')
+class RosterRebuildTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second = Employee.objects.bulk_create([
+            Employee(employee_number=f'ROSTER{i}', first_name='Roster', last_name=str(i)) for i in range(2)
+        ])
+        cls.day_shift = Shift.objects.create(name='Day', start_time=time(8), end_time=time(16))
+        cls.night_shift = Shift.objects.create(name='Night', start_time=time(22), end_time=time(6), is_night_shift=True)
+        cls.rotation = ShiftRotation.objects.create(name='Alternating', anchor_date=date(2025, 1, 6))
+        ShiftRotationStep.objects.create(rotation=cls.rotation, order=0, shift=cls.day_shift, days=7)
+        ShiftRotationStep.objects.create(rotation=cls.rotation, order=1, shift=cls.night_shift, days=7)
+
+    def test_edited_assignment_rebuilds_the_old_and_new_days(self, delay):
+        assignment = ShiftAssignment.objects.create(employee=self.first, shift=self.day_shift, start_date=date(2026, 3, 1))
+        assignment.employee = self.second
+        assignment.start_date = date(2025, 6, 1)
+        assignment.end_date = date(2025, 9, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+        delay.assert_called_once_with('2025-06-01', timezone.localdate().isoformat(), [self.first.id, self.second.id])
+
+    def test_shift_and_rotation_edits_rebuild_their_assignments(self, delay):
+        ShiftAssignment.objects.create(
+            employee=self.first, rotation=self.rotation, start_date=date(2026, 1, 1), end_date=date(2026, 2, 28)
+        )
+        self.night_shift.name = 'Late'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.night_shift.save()
+        delay.assert_not_called()
+
+        self.night_shift.start_time = time(21)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.night_shift.save()
+        delay.assert_called_once_with('2026-01-01', '2026-02-28', [self.first.id])
+
+        delay.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rotation.steps.get(order=1).delete()
+        delay.assert_called_once_with('2026-01-01', '2026-02-28', [self.first.id])
+
+    def test_rebuild_runs_in_monthly_batches(self, delay):
+        with mock.patch('attendance.tasks.rebuild_attendance_logs', return_value=2) as rebuild:
+            self.assertEqual(rebuild_attendance_range('2026-01-01', '2026-03-15', [self.first.id]), 6)
+        self.assertEqual([call.args for call in rebuild.call_args_list], [
+            (date(2026, 1, 1), date(2026, 1, 31), [self.first.id]),
+            (date(2026, 2, 1), date(2026, 3, 3), [self.first.id]),
+            (date(2026, 3, 4), date(2026, 3, 15), [self.first.id]),
+        ])
+
+
+class AttendanceDetailsTests(TestCase):
+    def test_manual_logs_report_first_in_to_last_out(self):
+        employee = Employee.objects.create(employee_number='MANUAL01', first_name='Manual', last_name='Entry')
+        log = AttendanceLog.objects.create(
+            employee=employee, date=date(2026, 3, 2), first_in_time=time(22), last_out_time=time(6, 30),
+            source='manual'
+        )
+        self.client.force_login(get_user_model().objects.create_user(username='details', password='x'))
+
+        response = self.client.get(reverse('attendance:attendance_details', args=[log.id]))
+        self.assertEqual(response.json()['worked_hours'], '8.50')
+        response = self.client.get(reverse('attendance:attendance-detail-api', args=[log.id]))
+        self.assertEqual(response.json()['worked_minutes'], 510)
+
+
+class RunAttendanceImportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    def run_job(self, **import_behaviour):
+        job = ImportJob.objects.create(file=SimpleUploadedFile('punches.xlsx', b'not read'))
+        path = job.file.path
+        with mock.patch('attendance.tasks.import_attendance_file', **import_behaviour):
+            run_attendance_import(job.id)
+        job.refresh_from_db()
+        return job, path
+
+    def test_upload_is_deleted_when_the_job_completes(self):
+        job, path = self.run_job(return_value={
+            'rows_parsed': 0, 'records_created': 0, 'duplicates': 0, 'total_records': 0,
+            'logs_created': 0, 'new_employees': []
+        })
+        self.assertEqual(job.status, 'completed')
+        self.assertFalse(job.file)
+        self.assertFalse(os.path.exists(path))
+
+    def test_upload_is_deleted_when_the_job_fails(self):
+        job, path = self.run_job(side_effect=ValueError('Missing required columns'))
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(job.file)
+        self.assertFalse(os.path.exists(path))
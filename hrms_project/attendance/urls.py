@@ -7,10 +7,15 @@ app_name = 'attendance'
 # Create a router and register our viewsets with it
 router = DefaultRouter()
 router.register(r'shifts', views.ShiftViewSet, basename='shift')
+router.register(r'shift-rotations', views.ShiftRotationViewSet, basename='shift-rotation')
+router.register(r'shift-assignments', views.ShiftAssignmentViewSet, basename='shift-assignment')
 router.register(r'records', views.AttendanceRecordViewSet, basename='attendance-record')
+router.register(r'import-jobs', views.ImportJobViewSet, basename='import-job')
 router.register(r'logs', views.AttendanceLogListViewSet, basename='attendance-log')
 router.register(r'leaves', views.LeaveViewSet, basename='leave')
+router.register(r'leave-ledger', views.LeaveLedgerEntryViewSet, basename='leave-ledger')
 router.register(r'holidays', views.HolidayViewSet, basename='holiday')
+router.register(r'daily-status', views.DailyAttendanceStatusViewSet, basename='daily-status')
 router.register(r'attendance-logs', views.AttendanceLogListViewSet, basename='attendance-log-list')
 
 urlpatterns = [
@@ -29,8 +34,14 @@ urlpatterns = [
     path('api/logs/<int:log_id>/details/', views.attendance_detail_api, name='attendance-detail-api'),
     path('api/search-employees/', views.search_employees, name='search_employees'),
     path('api/calendar-events/', views.calendar_events, name='calendar_events'),
+    path('api/calendar/', views.get_calendar_events, name='calendar-events-api'),
+    path('api/calendar/day/', views.get_calendar_day, name='calendar-day'),
+    path('api/cache-stats/', views.attendance_cache_stats, name='attendance-cache-stats'),
+    path('api/leave-balance/', views.get_leave_balance, name='leave-balance'),
     path('api/attendance-details/<int:log_id>/', views.attendance_details, name='attendance_details'),
     path('api/employee/<int:employee_id>/attendance/', views.get_employee_attendance, name='employee-attendance'),
+    path('api/attendance-summary/', views.get_attendance_summaries_api, name='attendance-summary'),
+    path('api/attendance-matrix/', views.get_attendance_matrix, name='attendance-matrix'),
     path('api/records/<int:record_id>/', views.attendance_record_api, name='attendance-record-api'),
     path('api/records/', views.add_attendance_record, name='add-attendance-record'),
 ]
@@ -1,110 +1,286 @@
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+import numpy as np
+import openpyxl
 import pandas as pd
+import xlrd
 from datetime import datetime, time, timedelta
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
-from .models import AttendanceRecord, AttendanceLog
+from django.db.models import Case, CharField, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Concat
+from django.contrib.postgres.aggregates import ArrayAgg
+from .models import AttendanceRecord, AttendanceLog, DailyAttendanceStatus, Leave
+from .cache import bump_data_version
+from .leave_balances import leave_balance_errors, leave_consumption_entries, post_ledger_entries
+from .loaders import PUNCH_COLUMNS, load_punches
+from .pairing import pair_punches
+from .shifts import assign_frame_work_dates, assign_work_date, build_shift_schedule
+from .working_days import get_employee_calendars, get_working_calendar
 from employees.models import Employee
 
-def process_attendance_excel(file_path):
+# Set while the rollup deletes a batch of stale logs; it refreshes the cache
+# versions and daily statuses of the whole batch itself
+_log_signals = threading.local()
+
+@contextmanager
+def log_delete_signals_muted():
+    """Make the per-log post_delete receivers skip the logs deleted inside the block"""
+    _log_signals.muted = True
+    try:
+        yield
+    finally:
+        _log_signals.muted = False
+
+def log_delete_signals_are_muted():
+    return getattr(_log_signals, 'muted', False)
+
+ATTENDANCE_OPTIONAL_COLUMNS = [
+    'device_name', 'event_point', 'verify_type', 'event_description', 'remarks'
+]
+
+def normalize_attendance_frame(df):
     """
-    Process attendance Excel file from the machine
+    Standardize an attendance DataFrame read from the machine export.
+    Column names are snake_cased, `date_and_time` is parsed in one vectorized
+    pass and `personnel_id` is coerced to the string form of `employee_number`.
+    Rows without a parseable timestamp or personnel ID are dropped.
+    """
+    df.columns = [str(c).strip().lower().replace(' ', '_') for c in df.columns]
+
+    required_columns = ['date_and_time', 'personnel_id']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise Exception(f"Missing required columns: {', '.join(missing_columns)}")
+
+    df['timestamp'] = pd.to_datetime(df['date_and_time'], errors='coerce')
+    unparsed = df['timestamp'].isna() & df['date_and_time'].notna()
+    if unparsed.any():
+        # Fall back to per-value inference only for rows off the dominant format
+        df.loc[unparsed, 'timestamp'] = pd.to_datetime(
+            df.loc[unparsed, 'date_and_time'], errors='coerce', format='mixed'
+        )
+    if df['timestamp'].dt.tz is None:
+        df['timestamp'] = df['timestamp'].dt.tz_localize(
+            settings.TIME_ZONE, ambiguous='NaT', nonexistent='shift_forward'
+        )
+
+    personnel_ids = df['personnel_id']
+    # Only cells read as numbers (e.g. 456.0) are normalized; text IDs such as
+    # '00456' keep their leading zeros
+    if pd.api.types.is_numeric_dtype(personnel_ids):
+        numeric_ids = personnel_ids.astype('float64')
+    else:
+        is_number = personnel_ids.map(
+            lambda value: isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+        )
+        numeric_ids = pd.to_numeric(personnel_ids.where(is_number), errors='coerce')
+    is_integral = numeric_ids.notna() & (numeric_ids % 1 == 0)
+    df['personnel_id'] = personnel_ids.astype(str).str.strip()
+    df.loc[is_integral, 'personnel_id'] = numeric_ids[is_integral].astype('int64').astype(str)
+    df.loc[personnel_ids.isna(), 'personnel_id'] = None
+
+    for column in ATTENDANCE_OPTIONAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].where(df[column].notna(), '').astype(str)
+        else:
+            df[column] = ''
+
+    return df.dropna(subset=['timestamp', 'personnel_id'])
+
+def resolve_employee_ids(df):
+    """
+    Map every personnel ID in the frame to an Employee primary key with a
+    single `employee_number__in` query. Unknown personnel IDs get placeholder
+    employees created in bulk.
+    Returns: {employee_number: employee_id}, new_employees
+    """
+    personnel_ids = df['personnel_id'].unique().tolist()
+    employee_map = dict(
+        Employee.objects.filter(employee_number__in=personnel_ids)
+        .values_list('employee_number', 'id')
+    )
+
+    missing = df[~df['personnel_id'].isin(employee_map.keys())]
+    missing = missing.drop_duplicates(subset='personnel_id')
+    new_employees = []
+    if not missing.empty:
+        placeholders = []
+        for row in missing.itertuples(index=False):
+            first_name = getattr(row, 'first_name', None)
+            last_name = getattr(row, 'last_name', None)
+            placeholders.append(Employee(
+                employee_number=row.personnel_id,
+                first_name=first_name if pd.notna(first_name) else f"Employee {row.personnel_id}",
+                last_name=last_name if pd.notna(last_name) else '',
+                email=f"employee{row.personnel_id}@placeholder.com"
+            ))
+        for employee in Employee.objects.bulk_create(placeholders):
+            employee_map[employee.employee_number] = employee.id
+            new_employees.append({
+                'id': employee.id,
+                'employee_number': employee.employee_number,
+                'name': f"{employee.first_name} {employee.last_name}".strip()
+            })
+
+    return employee_map, new_employees
+
+def timestamp_epoch_seconds(timestamps):
+    """Integer UNIX epoch seconds for a tz-aware datetime Series"""
+    return (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+def iter_attendance_chunks(file_path, chunk_size):
+    """
+    Yield the attendance sheet as DataFrames of at most chunk_size rows.
+    .xlsx files are read with openpyxl in read-only mode and .xls files with
+    xlrd on-demand sheets, so only one chunk of rows is materialized as a
+    DataFrame at a time.
+    """
+    file_extension = str(file_path).lower()
+    if file_extension.endswith('.xls'):
+        rows = _iter_xls_rows(file_path)
+    else:
+        rows = _iter_xlsx_rows(file_path)
+
+    header = next(rows, None)
+    if header is None:
+        return
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=header)
+
+def _iter_xlsx_rows(file_path):
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            if any(value is not None for value in row):
+                yield row
+    finally:
+        workbook.close()
+
+def _iter_xls_rows(file_path):
+    # xlrd needs the whole .xls stream, but on_demand only parses the first
+    # sheet and cells are converted to Python values one row at a time
+    if isinstance(file_path, (str, os.PathLike)):
+        book = xlrd.open_workbook(file_path, on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_contents=file_path.read(), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_index in range(sheet.nrows):
+            row = []
+            for cell in sheet.row(row_index):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    row.append(xlrd.xldate.xldate_as_datetime(cell.value, book.datemode))
+                elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    row.append(None)
+                else:
+                    row.append(cell.value)
+            if any(value is not None for value in row):
+                yield row
+    finally:
+        book.release_resources()
+
+def import_attendance_frame(df):
+    """
+    Deduplicate and insert one chunk of machine punches through load_punches.
+    Returns: records_created, duplicates, new_employees, unique_dates, touched
+    where touched is the set of (employee_id, date) that received new punches.
+    """
+    df = normalize_attendance_frame(df)
+    if df.empty:
+        return 0, 0, [], set(), set()
+
+    # Resolve all personnel IDs in one query and join them onto the frame
+    employee_map, new_employees = resolve_employee_ids(df)
+    df['employee_id'] = df['personnel_id'].map(employee_map)
+
+    # Calendar rule first, then punches inside a shift window take its date
+    start_hour = getattr(settings, 'ATTENDANCE_WORKDAY_START_HOUR', 0)
+    df['work_date'] = (df['timestamp'].dt.tz_convert(settings.TIME_ZONE) - pd.Timedelta(hours=start_hour)).dt.date
+    df['work_date'] = assign_frame_work_dates(df['employee_id'], df['timestamp'], df['work_date'])
+    unique_dates = set(df['work_date'].unique())
+
+    # Drop repeats within the chunk; the loader skips punches already stored
+    df['epoch'] = timestamp_epoch_seconds(df['timestamp'])
+    is_repeat = df.duplicated(subset=['employee_id', 'epoch'])
+    df['employee_id'] = df['employee_id'].astype('int64')
+
+    created_keys, duplicates = load_punches(
+        (employee_id, timestamp.to_pydatetime(), *details)
+        for employee_id, timestamp, *details
+        in df.loc[~is_repeat, PUNCH_COLUMNS].itertuples(index=False, name=None)
+    )
+    records_created = len(created_keys)
+    duplicates += int(is_repeat.sum())
+    touched = {(employee_id, work_date) for employee_id, _, work_date in created_keys}
+
+    return records_created, duplicates, new_employees, unique_dates, touched
+
+def import_attendance_file(file_path, chunk_size=None, progress=None):
+    """
+    Import an attendance Excel file from the machine
     Expected columns: Date And Time, Personnel ID, Device Name, Event Point, 
                      Verify Type, Event Description, Remarks
+    The sheet is streamed in chunks of chunk_size rows (default
+    ATTENDANCE_IMPORT_CHUNK_SIZE); each chunk is deduplicated and inserted
+    before the next one is read, keeping peak memory flat. The logs a chunk
+    touches are recomputed in the same transaction as its punches, so an
+    import that fails part way never leaves committed punches behind stale
+    logs. If given, progress(rows_parsed, records_created, duplicates) is
+    called per chunk.
+    Returns a dict with rows_parsed, records_created, duplicates,
+    total_records, logs_created, new_employees and unique_dates.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'ATTENDANCE_IMPORT_CHUNK_SIZE', 5000)
+
+    result = {
+        'rows_parsed': 0,
+        'records_created': 0,
+        'duplicates': 0,
+        'total_records': 0,
+        'logs_created': 0,
+        'new_employees': [],
+        'unique_dates': set()
+    }
+
+    for chunk in iter_attendance_chunks(file_path, chunk_size):
+        result['rows_parsed'] += len(chunk)
+        with transaction.atomic():
+            created, duplicates, new_employees, unique_dates, touched = import_attendance_frame(chunk)
+            # Only the (employee, date) pairs that received new punches are stale
+            result['logs_created'] += recompute_attendance_logs(touched)
+        result['records_created'] += created
+        result['duplicates'] += duplicates
+        result['new_employees'].extend(new_employees)
+        result['unique_dates'] |= unique_dates
+        if progress:
+            progress(result['rows_parsed'], result['records_created'], result['duplicates'])
+
+    result['total_records'] = AttendanceRecord.objects.count()
+    return result
+
+def process_attendance_excel(file_path, chunk_size=None, progress=None):
+    """
+    Process attendance Excel file from the machine
     Returns: records_created, duplicates, total_records, new_employees, unique_dates
     """
     try:
-        # Determine the engine based on file extension
-        file_extension = str(file_path).lower()
-        engine = 'xlrd' if file_extension.endswith('.xls') else 'openpyxl'
-        
-        # Read Excel file
-        df = pd.read_excel(file_path, engine=engine)
-        
-        if df.empty:
-            return 0, 0, 0, [], set()
-            
-        # Standardize column names
-        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
-        
-        # Verify required columns
-        required_columns = ['date_and_time', 'personnel_id']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise Exception(f"Missing required columns: {', '.join(missing_columns)}")
-        
-        records_to_create = []
-        duplicates = 0
-        new_employees = []
-        unique_dates = set()
-        
-        # Get existing timestamps for each employee to check duplicates
-        existing_records = {
-            (str(r.employee_id), r.timestamp.strftime('%Y-%m-%d %H:%M:%S')): True 
-            for r in AttendanceRecord.objects.all()
-        }
-        
-        # Get existing employee numbers
-        existing_employee_numbers = set(Employee.objects.values_list('employee_number', flat=True))
-        
-        for _, row in df.iterrows():
-            try:
-                # Convert date_and_time to datetime
-                timestamp = pd.to_datetime(row['date_and_time'])
-                unique_dates.add(timestamp.date())
-                
-                # Try to get employee or create placeholder
-                try:
-                    employee = Employee.objects.get(employee_number=row['personnel_id'])
-                except Employee.DoesNotExist:
-                    # Only create employee if not already created in this session
-                    if row['personnel_id'] not in existing_employee_numbers:
-                        employee = Employee.objects.create(
-                            employee_number=row['personnel_id'],
-                            first_name=row.get('first_name', f"Employee {row['personnel_id']}"),
-                            last_name=row.get('last_name', ''),
-                            email=f"employee{row['personnel_id']}@placeholder.com"
-                        )
-                        new_employees.append({
-                            'id': employee.id,
-                            'employee_number': employee.employee_number,
-                            'name': f"{employee.first_name} {employee.last_name}".strip()
-                        })
-                        existing_employee_numbers.add(row['personnel_id'])
-                    else:
-                        employee = Employee.objects.get(employee_number=row['personnel_id'])
-                
-                # Check for duplicates
-                record_key = (str(employee.id), timestamp.strftime('%Y-%m-%d %H:%M:%S'))
-                if record_key in existing_records:
-                    duplicates += 1
-                    continue
-                
-                # Create attendance record
-                record = AttendanceRecord(
-                    employee=employee,
-                    timestamp=timestamp,
-                    device_name=row.get('device_name', ''),
-                    event_point=row.get('event_point', ''),
-                    verify_type=row.get('verify_type', ''),
-                    event_description=row.get('event_description', ''),
-                    remarks=row.get('remarks', '')
-                )
-                records_to_create.append(record)
-                existing_records[record_key] = True
-                
-            except Exception as e:
-                continue
-        
-        # Bulk create records
-        records_created = 0
-        if records_to_create:
-            AttendanceRecord.objects.bulk_create(records_to_create, ignore_conflicts=True)
-            records_created = len(records_to_create)
-        
-        total_records = AttendanceRecord.objects.count()
-        
-        return records_created, duplicates, total_records, new_employees, unique_dates
-        
+        result = import_attendance_file(file_path, chunk_size, progress)
+        return (
+            result['records_created'], result['duplicates'], result['total_records'],
+            result['new_employees'], result['unique_dates']
+        )
     except Exception as e:
         raise Exception(f"Error processing Excel file: {str(e)}")
 
@@ -115,9 +291,8 @@ def generate_attendance_log(date, employee):
     """
     try:
         # Get all attendance records for the employee on the date
-        records = AttendanceRecord.objects.filter(
+        records = AttendanceRecord.objects.for_work_dates(date).filter(
             employee=employee,
-            timestamp__date=date,
             is_active=True
         ).order_by('timestamp')
         
@@ -137,40 +312,176 @@ def generate_attendance_log(date, employee):
         print(f"Error generating attendance log: {str(e)}")
         return None, None
 
+def rebuild_attendance_logs(start_date, end_date=None, employee_ids=None):
+    """
+    Recompute system attendance logs for every (employee, date) in a range.
+    Punch work dates are first re-derived from the shift schedule, then
+    first in / last out come from a single MIN/MAX GROUP BY over the raw
+    punches and all logs are written with one bulk upsert. System logs left
+    without punches are removed; logs entered manually (source='manual')
+    are left untouched.
+    Returns the number of logs written.
+    """
+    end_date = end_date or start_date
+    moved = reassign_work_dates(start_date, end_date, employee_ids)
+    written = _rollup_attendance_logs(start_date, end_date, employee_ids)
+    # Punches moved across the edge of the range also change the neighbouring days
+    written += recompute_attendance_logs(
+        (employee_id, date) for employee_id, date in moved if not start_date <= date <= end_date
+    )
+    return written
+
+def reassign_work_dates(start_date, end_date, employee_ids=None):
+    """
+    Re-derive the stored work_date of the punches around a date range from
+    the current shift schedule, e.g. after shifts were assigned or changed.
+    Punches stored under the day before or after the range are included, as
+    they may belong to a shift inside it (e.g. the morning out-punch of a
+    night shift on the last day). The schedule is built once for the range
+    and changed punches are written with one UPDATE per work date.
+    Returns the set of (employee_id, date) whose punches changed, old and new.
+    """
+    start_date -= timedelta(days=1)
+    end_date += timedelta(days=1)
+    records = AttendanceRecord.objects.for_work_dates(start_date, end_date)
+    if employee_ids is not None:
+        records = records.filter(employee_id__in=employee_ids)
+    punches = list(records.values_list('id', 'employee_id', 'timestamp', 'work_date'))
+    if not punches:
+        return set()
+
+    schedule = build_shift_schedule({row[1] for row in punches}, start_date, end_date)
+    moved = {}
+    touched = set()
+    for record_id, employee_id, timestamp, work_date in punches:
+        new_date = assign_work_date(schedule, employee_id, timestamp)
+        if new_date != work_date:
+            moved.setdefault(new_date, []).append(record_id)
+            touched.update({(employee_id, work_date), (employee_id, new_date)})
+
+    timestamps = [row[2] for row in punches]
+    with transaction.atomic():
+        for new_date, record_ids in moved.items():
+            # The timestamp bounds let PostgreSQL prune the monthly partitions
+            AttendanceRecord.objects.filter(
+                id__in=record_ids, timestamp__range=(min(timestamps), max(timestamps))
+            ).update(work_date=new_date)
+    return touched
+
+def recompute_attendance_logs(pairs):
+    """
+    Recompute only the attendance logs for the given (employee_id, date)
+    pairs, e.g. those touched by newly inserted or deactivated punches.
+    System logs left without any active punch are removed.
+    Returns the number of logs written.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    employee_ids = {employee_id for employee_id, _ in pairs}
+    dates = [date for _, date in pairs]
+    return _rollup_attendance_logs(min(dates), max(dates), employee_ids, only=pairs)
+
+def _rollup_attendance_logs(start_date, end_date, employee_ids=None, only=None):
+    records = AttendanceRecord.objects.for_work_dates(start_date, end_date).filter(is_active=True)
+    logs_in_range = AttendanceLog.objects.filter(date__range=(start_date, end_date))
+    if employee_ids is not None:
+        records = records.filter(employee_id__in=employee_ids)
+        logs_in_range = logs_in_range.filter(employee_id__in=employee_ids)
+
+    manual_keys = set(logs_in_range.filter(source='manual').values_list('employee_id', 'date'))
+    daily_punches = records.values('employee_id', 'work_date').annotate(
+        first_punch=Min('timestamp'),
+        last_punch=Max('timestamp'),
+        punches=ArrayAgg('timestamp', ordering='timestamp')
+    ).order_by()
+
+    daily_punches = [
+        row for row in daily_punches
+        if (row['employee_id'], row['work_date']) not in manual_keys
+        and (only is None or (row['employee_id'], row['work_date']) in only)
+    ]
+    schedule = build_shift_schedule(
+        {row['employee_id'] for row in daily_punches}, start_date, end_date
+    ) if daily_punches else {}
+
+    logs = []
+    for row in daily_punches:
+        pairing = pair_punches(row['punches'])
+        employee_schedule = schedule.get(row['employee_id'])
+        window = employee_schedule.by_date.get(row['work_date']) if employee_schedule else None
+        logs.append(AttendanceLog(
+            employee_id=row['employee_id'],
+            date=row['work_date'],
+            first_in_time=timezone.localtime(row['first_punch']).time(),
+            last_out_time=timezone.localtime(row['last_punch']).time(),
+            shift_id=window.shift_id if window else None,
+            late_minutes=_minutes_between(window.shift_start, row['first_punch']) if window else 0,
+            early_leave_minutes=_minutes_between(row['last_punch'], window.shift_end) if window else 0,
+            punch_intervals=pairing['intervals'],
+            worked_minutes=pairing['worked_minutes'],
+            break_minutes=pairing['break_minutes'],
+            source='system'
+        ))
+
+    with transaction.atomic():
+        AttendanceLog.objects.bulk_create(
+            logs,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=[
+                'first_in_time', 'last_out_time', 'shift', 'late_minutes',
+                'early_leave_minutes', 'punch_intervals', 'worked_minutes',
+                'break_minutes', 'source'
+            ]
+        )
+
+        # Days that lost their last active punch no longer have a system log
+        written = {(log.employee_id, log.date) for log in logs}
+        stale = {
+            (employee_id, date): log_id for log_id, employee_id, date
+            in logs_in_range.filter(source='system').values_list('id', 'employee_id', 'date')
+            if (employee_id, date) not in written and (only is None or (employee_id, date) in only)
+        }
+        if stale:
+            with log_delete_signals_muted():
+                AttendanceLog.objects.filter(id__in=stale.values()).delete()
+
+        # bulk_create sends no post_save and the stale logs were deleted with
+        # their receivers muted, so invalidate the cached months and refresh
+        # the daily statuses of the changed days here, once for the batch
+        changed = written | set(stale)
+        if changed:
+            dates = [date for _, date in changed]
+            bump_data_version(min(dates), max(dates))
+            materialize_daily_status_for(changed)
+
+    return len(logs)
+
+def _minutes_between(earlier, later):
+    """Whole minutes from earlier to later, 0 if later is not after earlier"""
+    return max(int((later - earlier).total_seconds() // 60), 0)
+
+def deactivate_attendance_records(queryset):
+    """
+    Soft-delete raw punches and refresh only the attendance logs they fed.
+    Returns the number of punches deactivated.
+    """
+    touched = set(queryset.filter(is_active=True).values_list('employee_id', 'work_date'))
+    updated = queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+    recompute_attendance_logs(touched)
+    return updated
+
 def process_daily_attendance(date=None):
     """
     Process attendance records and create attendance logs for all employees
     """
     if date is None:
-        date = timezone.now().date()
+        date = timezone.localdate()
     
     try:
-        # Get all employees with attendance records for the date
-        employees = Employee.objects.filter(
-            attendance_records__timestamp__date=date,
-            attendance_records__is_active=True
-        ).distinct()
-        
-        logs_created = 0
-        
-        for employee in employees:
-            first_in, last_out = generate_attendance_log(date, employee)
-            
-            if first_in and last_out:
-                # Create or update attendance log
-                AttendanceLog.objects.update_or_create(
-                    employee=employee,
-                    date=date,
-                    defaults={
-                        'first_in_time': first_in,
-                        'last_out_time': last_out,
-                        'source': 'system'
-                    }
-                )
-                logs_created += 1
-        
-        return logs_created
-    
+        return rebuild_attendance_logs(date)
     except Exception as e:
         raise Exception(f"Error processing daily attendance: {str(e)}")
 
@@ -211,12 +522,13 @@ def get_attendance_summary(employee, start_date, end_date):
         is_active=True
     ).order_by('date')
     
+    totals = get_attendance_summaries([employee.id], start_date, end_date)[0]
     summary = {
-        'total_days': (end_date - start_date).days + 1,
-        'present_days': logs.count(),
-        'absent_days': 0,
-        'leave_days': 0,
-        'holidays': 0,
+        'total_days': totals['total_days'],
+        'present_days': totals['present_days'],
+        'absent_days': totals['absent_days'],
+        'leave_days': totals['leave_days'],
+        'holidays': totals['holidays'],
         'attendance_details': []
     }
     
@@ -228,4 +540,660 @@ def get_attendance_summary(employee, start_date, end_date):
             'source': log.source
         })
     
-    return summary
\ No newline at end of file
+    return summary
+
+def _logs_by_weekend_pattern(logs, calendars, start_date, end_date):
+    """
+    Split logs by the weekend pattern of their employees' calendars
+    ({employee_id: WorkingCalendar}), so callers run one GROUP BY per
+    pattern, usually a single one. logs must already be limited to the
+    employees of calendars; with a single pattern they are yielded as is.
+    Yields (calendar, logs, set of its non-working days in the range).
+    """
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    patterns = set(calendars.values())
+    for calendar in patterns:
+        non_working = {
+            day for day, working in zip(days, calendar.working_mask(start_date, end_date)) if not working
+        }
+        calendar_logs = logs
+        if len(patterns) > 1:
+            calendar_logs = logs.filter(employee_id__in=[
+                employee_id for employee_id, employee_calendar in calendars.items() if employee_calendar is calendar
+            ])
+        yield calendar, calendar_logs, non_working
+
+def _working_day_log_q(non_working):
+    """Logs on a working day (not in non_working) on or after the employee's joined_date"""
+    return ~Q(date__in=non_working) & (
+        Q(employee__joined_date__isnull=True) | Q(date__gte=F('employee__joined_date'))
+    )
+
+def get_attendance_summaries(employee_ids, start_date, end_date):
+    """
+    Attendance summaries for many employees over one date range.
+    Present, late and total hours come from one GROUP BY over AttendanceLog,
+    leave days from the approved leaves and working days from each
+    employee's working calendar, counted from their joined_date. Absent days
+    are those working days up to today with neither a log nor leave.
+    Returns a list of dicts in employee_ids order.
+    """
+    employee_ids = list(employee_ids)
+    today = timezone.localdate()
+    absent_end = min(end_date, today)
+    calendars = get_employee_calendars(employee_ids)
+    holidays = get_working_calendar().holidays_between(start_date, end_date)
+
+    logs = AttendanceLog.objects.filter(
+        employee_id__in=employee_ids, date__range=(start_date, end_date), is_active=True
+    )
+    log_totals = {}
+    non_working = {}
+    for calendar, calendar_logs, non_working[calendar] in _logs_by_weekend_pattern(
+        logs, calendars, start_date, end_date
+    ):
+        # Logs on an elapsed working day since joining are what reduces the absent count
+        elapsed_working_log = Q(date__lte=absent_end) & _working_day_log_q(non_working[calendar])
+        log_totals.update(
+            (row['employee_id'], row)
+            for row in calendar_logs.values('employee_id').annotate(
+                present=Count('id'),
+                present_working=Count('id', filter=elapsed_working_log),
+                late=Count('id', filter=late_arrival_q()),
+                worked=Sum(worked_time_expression())
+            ).order_by()
+        )
+    leave_days = get_leave_days(start_date, end_date, employee_ids)
+    employees = {
+        employee.id: employee
+        for employee in Employee.objects.filter(id__in=employee_ids).select_related('department')
+    }
+
+    summaries = []
+    for employee_id in employee_ids:
+        employee = employees.get(employee_id)
+        if employee is None:
+            continue
+        calendar = calendars[employee_id]
+        row = log_totals.get(employee_id, {})
+        # Days before joining are neither working days nor leave
+        first_day = max(start_date, employee.joined_date or start_date)
+        days_off = [
+            day for day in leave_days.get(employee_id, ())
+            if day >= first_day and day not in non_working[calendar]
+        ]
+        worked = row.get('worked') or timedelta()
+        summaries.append({
+            'employee_id': employee_id,
+            'personnel_id': employee.employee_number,
+            'employee_name': employee.get_full_name(),
+            'department': employee.department.name if employee.department else None,
+            'total_days': (end_date - start_date).days + 1,
+            'working_days': calendar.working_days_between(first_day, end_date),
+            'present_days': row.get('present', 0),
+            'absent_days': max(
+                calendar.working_days_between(first_day, absent_end)
+                - row.get('present_working', 0)
+                - sum(1 for day in days_off if day <= absent_end),
+                0
+            ),
+            'leave_days': len(days_off),
+            'holidays': len(holidays),
+            'late_days': row.get('late', 0),
+            'total_hours': round(max(worked.total_seconds(), 0) / 3600, 2)
+        })
+    return summaries
+
+def full_name_expression(prefix=''):
+    """Database expression of Employee.get_full_name(); prefix is the lookup path, e.g. 'employee__'"""
+    middle_name = Case(
+        When(Q(**{f'{prefix}middle_name__isnull': True}) | Q(**{f'{prefix}middle_name': ''}), then=Value('')),
+        default=Concat(Value(' '), F(f'{prefix}middle_name')),
+        output_field=CharField()
+    )
+    return Concat(
+        F(f'{prefix}first_name'), middle_name, Value(' '), F(f'{prefix}last_name'),
+        output_field=CharField()
+    )
+
+def worked_time_expression():
+    """
+    Database expression of a log's worked time: the paired net minutes for
+    system logs, first in to last out (past midnight included) for manual ones.
+    """
+    worked_time = ExpressionWrapper(F('last_out_time') - F('first_in_time'), output_field=DurationField())
+    return Case(
+        When(source='system', then=ExpressionWrapper(
+            F('worked_minutes') * timedelta(minutes=1), output_field=DurationField()
+        )),
+        When(last_out_time__gte=F('first_in_time'), then=worked_time),
+        default=ExpressionWrapper(worked_time + timedelta(days=1), output_field=DurationField())
+    )
+
+def get_default_shift_start():
+    """Start time applied to logs without a shift (ATTENDANCE_DEFAULT_SHIFT_START)"""
+    return datetime.strptime(getattr(settings, 'ATTENDANCE_DEFAULT_SHIFT_START', '08:00'), '%H:%M').time()
+
+def late_arrival_q():
+    """
+    Q matching late logs: late minutes stamped by the rollup for logs with a
+    shift, first punch after the default start for the others
+    """
+    return (
+        Q(shift__isnull=False, late_minutes__gt=0) |
+        Q(shift__isnull=True, first_in_time__gt=get_default_shift_start())
+    )
+
+def is_late_arrival(log):
+    if log.shift_id:
+        return log.late_minutes > 0
+    return bool(log.first_in_time and log.first_in_time > get_default_shift_start())
+
+def get_leave_days(start_date, end_date, employees=None):
+    """
+    Days within the range each employee spends on approved leave, leaving out
+    days they still have an attendance log for. Leaves are few, so they are
+    expanded per day in Python.
+    Returns: {employee_id: set of dates}
+    """
+    leaves = Leave.objects.filter(
+        is_active=True, status='approved',
+        start_date__lte=end_date, end_date__gte=start_date
+    )
+    if employees is not None:
+        leaves = leaves.filter(employee__in=employees)
+    leave_rows = list(leaves.values_list('employee_id', 'start_date', 'end_date'))
+    if not leave_rows:
+        return {}
+
+    attended = set(AttendanceLog.objects.filter(
+        employee_id__in={row[0] for row in leave_rows},
+        date__range=(start_date, end_date),
+        is_active=True
+    ).values_list('employee_id', 'date'))
+    leave_days = {}
+    for employee_id, leave_start, leave_end in leave_rows:
+        day = max(leave_start, start_date)
+        while day <= min(leave_end, end_date):
+            if (employee_id, day) not in attended:
+                leave_days.setdefault(employee_id, set()).add(day)
+            day += timedelta(days=1)
+    return leave_days
+
+def get_employees_on_leave(start_date, end_date=None):
+    """
+    Ids of the employees with an approved leave overlapping start_date to
+    end_date (one day by default), read from the approved-leaves index.
+    Returns a values queryset of distinct employee_id.
+    """
+    return Leave.objects.filter(
+        is_active=True, status='approved',
+        start_date__lte=end_date or start_date, end_date__gte=start_date
+    ).values('employee_id').distinct()
+
+def bulk_update_leave_status(leave_ids, status, user):
+    """
+    Approve or reject many leaves in one transaction.
+    Validation runs in set form: one query locks the leaves, one finds what
+    they could overlap once approved and one reads the balances they draw
+    on. Valid leaves are written with a single UPDATE and their ledger
+    entries with bulk inserts; what Leave.save and its signals would do per
+    leave (cache versions, daily statuses) is done once for the batch.
+    Returns one {'id', 'result', 'error'} dict per id, in the order given;
+    result is 'updated', 'unchanged' or 'error'.
+    """
+    leave_ids = list(dict.fromkeys(leave_ids))
+    results = {}
+    with transaction.atomic():
+        leaves = Leave.objects.select_for_update().in_bulk(leave_ids)
+        candidates = []
+        for leave_id in leave_ids:
+            leave = leaves.get(leave_id)
+            if leave is None:
+                results[leave_id] = {'result': 'error', 'error': 'Leave not found'}
+            elif not leave.is_active:
+                results[leave_id] = {'result': 'error', 'error': 'Leave is inactive'}
+            elif leave.status == status:
+                results[leave_id] = {'result': 'unchanged'}
+            else:
+                candidates.append(leave)
+
+        if status == 'approved':
+            errors = _leave_overlap_errors(candidates)
+            candidates = [leave for leave in candidates if leave.id not in errors]
+        else:
+            errors = {}
+        for leave in candidates:
+            leave.status = status
+            leave.approved_by_id = user.id
+        entries = leave_consumption_entries(candidates)
+        if status == 'approved':
+            errors.update(leave_balance_errors(candidates, entries))
+            candidates = [leave for leave in candidates if leave.id not in errors]
+            entries = [entry for entry in entries if entry.leave_id not in errors]
+        for leave_id, error in errors.items():
+            results[leave_id] = {'result': 'error', 'error': error}
+
+        if candidates:
+            Leave.objects.filter(id__in=[leave.id for leave in candidates]).update(
+                status=status, approved_by=user, updated_at=timezone.now()
+            )
+            post_ledger_entries(entries)
+            start_date = min(leave.start_date for leave in candidates)
+            end_date = max(leave.end_date for leave in candidates)
+            bump_data_version(start_date, end_date)
+            materialize_daily_status(start_date, end_date, {leave.employee_id for leave in candidates})
+            for leave in candidates:
+                results[leave.id] = {'result': 'updated'}
+
+    return [{'id': leave_id, 'error': None, **results[leave_id]} for leave_id in leave_ids]
+
+def _leave_overlap_errors(leaves):
+    """
+    Leaves that would overlap another active leave of the same employee once
+    approved. Only rejected leaves come back into the scope of the overlap
+    constraint; they are checked against the stored leaves and against each
+    other, earlier ids first.
+    Returns: {leave_id: error}
+    """
+    returning = [leave for leave in leaves if leave.status == 'rejected']
+    if not returning:
+        return {}
+    spans = defaultdict(list)
+    for other_id, employee_id, start_date, end_date in Leave.objects.filter(
+        is_active=True,
+        employee_id__in={leave.employee_id for leave in returning},
+        start_date__lte=max(leave.end_date for leave in returning),
+        end_date__gte=min(leave.start_date for leave in returning)
+    ).exclude(status='rejected').values_list('id', 'employee_id', 'start_date', 'end_date'):
+        spans[employee_id].append((other_id, start_date, end_date))
+
+    errors = {}
+    for leave in returning:
+        conflict = next((
+            other_id for other_id, start_date, end_date in spans[leave.employee_id]
+            if start_date <= leave.end_date and end_date >= leave.start_date
+        ), None)
+        if conflict:
+            errors[leave.id] = f'Overlaps leave {conflict}'
+        else:
+            spans[leave.employee_id].append((leave.id, leave.start_date, leave.end_date))
+    return errors
+
+def get_calendar_summary(start_date, end_date, department_id=None):
+    """
+    Per-day attendance counts by department for a date range.
+    Present and late are grouped in SQL from AttendanceLog, on leave comes from
+    the approved leaves overlapping the range and absent is, among employees
+    for whom the day is an elapsed working day (their working calendar, from
+    their joined_date), those with neither a log nor leave.
+    Returns: [{'date', 'is_holiday', 'totals', 'departments': {department_id: counts}}]
+    """
+    employees = Employee.objects.filter(is_active=True)
+    logs = AttendanceLog.objects.filter(
+        date__range=(start_date, end_date), is_active=True, employee__is_active=True
+    )
+    if department_id:
+        employees = employees.filter(department_id=department_id)
+        logs = logs.filter(employee__department_id=department_id)
+
+    employee_rows = list(employees.values_list('id', 'department_id', 'joined_date'))
+    calendars = get_employee_calendars([employee_id for employee_id, _, _ in employee_rows])
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    day_array = np.array(days, dtype='datetime64[D]')
+    elapsed = day_array <= np.datetime64(timezone.localdate())
+
+    # Employees for whom each day is an elapsed working day, summed per
+    # department from one mask per (calendar, joined date) group
+    working = {}
+    groups = defaultdict(int)
+    for employee_id, dept_id, joined_date in employee_rows:
+        joined_date = joined_date if joined_date and joined_date > start_date else None
+        groups[(dept_id, calendars[employee_id], joined_date)] += 1
+    for (dept_id, calendar, joined_date), count in groups.items():
+        mask = calendar.working_mask(start_date, end_date) & elapsed
+        if joined_date:
+            mask &= day_array >= np.datetime64(joined_date)
+        working[dept_id] = working.get(dept_id, 0) + count * mask.astype(np.int64)
+
+    log_counts = {}
+    non_working = {}
+    for calendar, calendar_logs, non_working[calendar] in _logs_by_weekend_pattern(
+        logs, calendars, start_date, end_date
+    ):
+        # Logs on a working day since joining are what reduces the absent count
+        for row in calendar_logs.values('date', 'employee__department_id').annotate(
+            present=Count('id'),
+            present_working=Count('id', filter=_working_day_log_q(non_working[calendar])),
+            late=Count('id', filter=late_arrival_q())
+        ).order_by():
+            counts = log_counts.setdefault((row['date'], row['employee__department_id']), defaultdict(int))
+            for key in ('present', 'present_working', 'late'):
+                counts[key] += row[key]
+
+    leave_days = get_leave_days(start_date, end_date, employees)
+    joined = {employee_id: joined_date for employee_id, _, joined_date in employee_rows}
+    departments_on_leave = {employee_id: dept_id for employee_id, dept_id, _ in employee_rows}
+    leave_counts = {}
+    for employee_id, days_off in leave_days.items():
+        dept_id = departments_on_leave.get(employee_id)
+        for day in days_off:
+            # Leave on a weekend, a holiday or before joining is not a day off work
+            if day in non_working[calendars[employee_id]] or (joined[employee_id] and day < joined[employee_id]):
+                continue
+            leave_counts[(day, dept_id)] = leave_counts.get((day, dept_id), 0) + 1
+
+    holidays = get_working_calendar().holidays_between(start_date, end_date)
+
+    summary = []
+    for index, day in enumerate(days):
+        totals = {'present': 0, 'late': 0, 'on_leave': 0, 'absent': 0}
+        departments = {}
+        for dept_id, working_counts in working.items():
+            log_row = log_counts.get((day, dept_id), {})
+            counts = {
+                'present': log_row.get('present', 0),
+                'late': log_row.get('late', 0),
+                'on_leave': leave_counts.get((day, dept_id), 0),
+                'absent': 0
+            }
+            counts['absent'] = max(
+                int(working_counts[index]) - log_row.get('present_working', 0) - counts['on_leave'], 0
+            )
+            departments[dept_id] = counts
+            for key, value in counts.items():
+                totals[key] += value
+        summary.append({
+            'date': day,
+            'is_holiday': day in holidays,
+            'totals': totals,
+            'departments': departments
+        })
+    return summary
+
+def get_day_attendance(date, department_id=None, status=None):
+    """
+    Status of every active employee on one day: present, late, on_leave or
+    absent; None when the day is not one of their working days (weekend or
+    holiday in their working calendar, before joining, or still to come).
+    Returns a list of dicts ordered by employee name.
+    """
+    employees = Employee.objects.filter(is_active=True)
+    if department_id:
+        employees = employees.filter(department_id=department_id)
+
+    logs = {
+        log.employee_id: log
+        for log in AttendanceLog.objects.filter(
+            date=date, is_active=True, employee__in=employees
+        ).select_related('shift')
+    }
+    on_leave = dict(Leave.objects.filter(
+        is_active=True, status='approved', start_date__lte=date, end_date__gte=date,
+        employee__in=employees
+    ).values_list('employee_id', 'leave_type'))
+    employee_list = list(employees.select_related('department').order_by('first_name', 'last_name'))
+    calendars = get_employee_calendars([employee.id for employee in employee_list])
+
+    rows = []
+    for employee in employee_list:
+        log = logs.get(employee.id)
+        if log:
+            employee_status = 'late' if is_late_arrival(log) else 'present'
+        elif (
+            not calendars[employee.id].is_working_day(date)
+            or (employee.joined_date and date < employee.joined_date)
+            or date > timezone.localdate()
+        ):
+            employee_status = None
+        elif employee.id in on_leave:
+            employee_status = 'on_leave'
+        else:
+            employee_status = 'absent'
+        if status and employee_status != status:
+            continue
+        rows.append({
+            'employee_id': employee.id,
+            'personnel_id': employee.employee_number,
+            'employee_name': employee.get_full_name(),
+            'department': employee.department.name if employee.department else None,
+            'status': employee_status,
+            'log_id': log.id if log else None,
+            'first_in': log.first_in_time.strftime('%H:%M') if log else None,
+            'last_out': log.last_out_time.strftime('%H:%M') if log else None,
+            'leave_type': on_leave.get(employee.id)
+        })
+    return rows
+
+def materialize_daily_status_for(pairs):
+    """
+    Write the DailyAttendanceStatus rows of the given (employee_id, date)
+    pairs only, e.g. the days whose logs a rollup changed.
+    Returns the number of rows written.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    employee_ids = {employee_id for employee_id, _ in pairs}
+    dates = [date for _, date in pairs]
+    return materialize_daily_status(min(dates), max(dates), employee_ids, only=pairs)
+
+def materialize_daily_status(start_date, end_date, employee_ids=None, only=None):
+    """
+    Write the DailyAttendanceStatus rows of every active employee for each
+    day of the range up to today, with bulk upserts; with only, of those
+    (employee_id, date) pairs within it. A log makes the day
+    present or late; otherwise the day is a holiday, a weekend, leave (an
+    approved leave covering it) or absent, in that order, with weekends from
+    each employee's working calendar. Days before an employee's joined_date
+    get no row unless they have a log. Rows of employees no longer active
+    are removed from the range.
+    Returns the number of rows written.
+    """
+    end_date = min(end_date, timezone.localdate())
+    if start_date > end_date:
+        return 0
+
+    employees = Employee.objects.all()
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+    active_ids = []
+    inactive_ids = []
+    joined = {}
+    for employee_id, is_active, joined_date in employees.values_list('id', 'is_active', 'joined_date'):
+        if not is_active:
+            inactive_ids.append(employee_id)
+            continue
+        active_ids.append(employee_id)
+        if joined_date and joined_date > start_date:
+            joined[employee_id] = joined_date
+
+    # Rows to clear before the upsert: employees no longer active, and days
+    # before joining (rewritten below where a log exists)
+    stale = Q(employee_id__in=inactive_ids)
+    by_joined_date = defaultdict(list)
+    for employee_id, joined_date in joined.items():
+        by_joined_date[joined_date].append(employee_id)
+    for joined_date, ids in by_joined_date.items():
+        stale |= Q(employee_id__in=ids, date__lt=joined_date)
+
+    logs = {
+        (employee_id, day): (log_id, late)
+        for log_id, employee_id, day, late in AttendanceLog.objects.filter(
+            employee_id__in=active_ids, date__range=(start_date, end_date), is_active=True
+        ).annotate(
+            late=Case(When(late_arrival_q(), then=Value(True)), default=Value(False))
+        ).values_list('id', 'employee_id', 'date', 'late')
+    }
+    leaves = {}
+    for leave_id, employee_id, leave_start, leave_end in Leave.objects.filter(
+        employee_id__in=active_ids, is_active=True, status='approved',
+        start_date__lte=end_date, end_date__gte=start_date
+    ).values_list('id', 'employee_id', 'start_date', 'end_date'):
+        day = max(leave_start, start_date)
+        while day <= min(leave_end, end_date):
+            leaves[(employee_id, day)] = leave_id
+            day += timedelta(days=1)
+    calendars = get_employee_calendars(active_ids)
+    holidays = get_working_calendar().holidays_between(start_date, end_date)
+    if only is None:
+        days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        cells = [(employee_id, day) for employee_id in active_ids for day in days]
+    else:
+        active = set(active_ids)
+        cells = sorted(
+            (employee_id, day) for employee_id, day in only
+            if employee_id in active and start_date <= day <= end_date
+        )
+
+    rows = []
+    for employee_id, day in cells:
+        log_id, late = logs.get((employee_id, day), (None, False))
+        leave_id = leaves.get((employee_id, day))
+        if log_id:
+            status = 'late' if late else 'present'
+        elif employee_id in joined and day < joined[employee_id]:
+            continue
+        elif day in holidays:
+            status = 'holiday'
+        elif day.weekday() in calendars[employee_id].weekend_days:
+            status = 'weekend'
+        elif leave_id:
+            status = 'leave'
+        else:
+            status = 'absent'
+        rows.append(DailyAttendanceStatus(
+            employee_id=employee_id, date=day, status=status,
+            attendance_log_id=log_id, leave_id=leave_id
+        ))
+
+    with transaction.atomic():
+        DailyAttendanceStatus.objects.filter(stale, date__range=(start_date, end_date)).delete()
+        DailyAttendanceStatus.objects.bulk_create(
+            rows,
+            batch_size=2000,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=['status', 'attendance_log', 'leave', 'updated_at']
+        )
+    return len(rows)
+
+ATTENDANCE_EXPORT_COLUMNS = [
+    'Personnel ID', 'Employee Name', 'Department', 'Date',
+    'First In', 'Last Out', 'Shift', 'Source'
+]
+
+def iter_attendance_export_rows(queryset, chunk_size=2000):
+    """
+    Yield one list per attendance log in ATTENDANCE_EXPORT_COLUMNS order.
+    The rows are read as flat values through a server-side cursor, so memory
+    stays flat whatever the size of the range.
+    """
+    from .serializers import AttendanceLogListSerializer
+
+    rows = AttendanceLogListSerializer.values_queryset(queryset).annotate(
+        department_name=F('employee__department__name')
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [
+            row['personnel_id'],
+            row['employee_name'],
+            row['department_name'] or '',
+            row['date'].isoformat(),
+            row['first_in_time'].strftime('%H:%M:%S') if row['first_in_time'] else '',
+            row['last_out_time'].strftime('%H:%M:%S') if row['last_out_time'] else '',
+            row['shift_name'] or '',
+            row['source']
+        ]
+
+# One character per cell of the attendance matrix
+MATRIX_STATUS_CODES = {
+    '-': 'No data',
+    'P': 'Present',
+    'L': 'Late',
+    'A': 'Absent',
+    'V': 'On leave',
+    'H': 'Holiday',
+    'W': 'Weekend',
+}
+_MATRIX_CODE_BYTES = np.frombuffer(''.join(MATRIX_STATUS_CODES).encode(), dtype='S1')
+(_NO_DATA, _PRESENT, _LATE, _ABSENT, _ON_LEAVE, _HOLIDAY, _WEEKEND) = range(len(MATRIX_STATUS_CODES))
+
+def build_attendance_matrix(employees, start_date, end_date):
+    """
+    Employees x days attendance grid for a date range, filled with NumPy.
+    employees: Employee queryset giving the rows (ordered by employee number)
+    Returns a columnar dict: employee columns, the date index, one status
+    string per employee (a MATRIX_STATUS_CODES character per day) and the
+    worked hours per employee and day.
+    """
+    employee_rows = list(employees.order_by('employee_number').annotate(
+        full_name=full_name_expression()
+    ).values_list('id', 'employee_number', 'full_name', 'joined_date'))
+    dates = pd.date_range(start_date, end_date, freq='D')
+    employee_ids = np.array([row[0] for row in employee_rows], dtype=np.int64)
+    order = np.argsort(employee_ids)
+    status = np.full((len(employee_rows), len(dates)), _NO_DATA, dtype=np.int8)
+    hours = np.zeros(status.shape, dtype=np.float64)
+
+    # Weekends (per row, from each employee's calendar) and holidays first,
+    # every other elapsed day starts absent
+    calendars = get_employee_calendars(employee_ids.tolist())
+    weekend = np.zeros(status.shape, dtype=bool)
+    for calendar in set(calendars.values()):
+        rows = [row for row, employee_id in enumerate(employee_ids.tolist()) if calendars[employee_id] is calendar]
+        weekend[rows] = np.isin(dates.weekday, calendar.weekend_days)
+    holidays = get_working_calendar().holidays_between(start_date, end_date)
+    elapsed = dates.date <= min(end_date, timezone.localdate())
+    holiday = np.isin(dates.date, list(holidays))
+    status[elapsed & ~weekend & ~holiday] = _ABSENT
+    status[weekend] = _WEEKEND
+    status[:, holiday] = _HOLIDAY
+
+    def row_index(ids):
+        return order[np.searchsorted(employee_ids, ids, sorter=order)]
+
+    def column_index(days):
+        return (np.array(days, dtype='datetime64[D]') - np.datetime64(start_date, 'D')).astype(np.int64)
+
+    leave_pairs = [
+        (employee_id, day)
+        for employee_id, days in get_leave_days(start_date, end_date, employees).items()
+        for day in days
+    ]
+    if leave_pairs:
+        leave_ids, leave_dates = zip(*leave_pairs)
+        rows, columns = row_index(np.array(leave_ids)), column_index(leave_dates)
+        working = ~np.isin(status[rows, columns], [_WEEKEND, _HOLIDAY])
+        status[rows[working], columns[working]] = _ON_LEAVE
+
+    # Nothing is inferred for the days before an employee joined
+    joined = np.array([row[3] or start_date for row in employee_rows], dtype='datetime64[D]')
+    status[dates.values.astype('datetime64[D]')[None, :] < joined[:, None]] = _NO_DATA
+
+    logs = list(AttendanceLog.objects.filter(
+        employee__in=employees, date__range=(start_date, end_date), is_active=True
+    ).annotate(
+        late=Case(When(late_arrival_q(), then=Value(True)), default=Value(False)),
+        worked=worked_time_expression()
+    ).values_list('employee_id', 'date', 'late', 'worked'))
+    if logs:
+        log_ids, log_dates, late, worked = zip(*logs)
+        rows, columns = row_index(np.array(log_ids)), column_index(log_dates)
+        status[rows, columns] = np.where(np.array(late, dtype=bool), _LATE, _PRESENT)
+        hours[rows, columns] = np.array(worked, dtype='timedelta64[s]').astype(np.int64) / 3600
+
+    status_rows = _MATRIX_CODE_BYTES[status].view(f'S{max(len(dates), 1)}').ravel() if len(dates) else []
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'codes': MATRIX_STATUS_CODES,
+        'dates': [day.isoformat() for day in dates.date],
+        'employees': {
+            'id': employee_ids.tolist(),
+            'personnel_id': [row[1] for row in employee_rows],
+            'name': [row[2] for row in employee_rows],
+        },
+        'status': [row.decode() for row in status_rows],
+        'hours': np.round(hours, 2).tolist()
+    }
@@ -1,31 +1,41 @@
+import csv
+import itertools
+import tempfile
+import openpyxl
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.parsers import MultiPartParser
-from django.http import JsonResponse, Http404
+from django.http import FileResponse, JsonResponse, Http404, StreamingHttpResponse
 from django.db.models import Q
 from datetime import datetime, date, timedelta, time
 from employees.models import Employee, Department
 from time import time as time_func
-from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from .models import (
-    Shift, AttendanceRecord, AttendanceLog,
-    AttendanceEdit, Leave, Holiday
+    Shift, ShiftRotation, ShiftAssignment, AttendanceRecord, AttendanceLog,
+    AttendanceEdit, Leave, LeaveLedgerEntry, Holiday, DailyAttendanceStatus, ImportJob
 )
 from .serializers import (
-    ShiftSerializer, AttendanceRecordSerializer,
-    AttendanceLogSerializer, AttendanceEditSerializer,
-    LeaveSerializer, HolidaySerializer
+    ShiftSerializer, ShiftRotationSerializer, ShiftAssignmentSerializer, AttendanceRecordSerializer,
+    AttendanceLogSerializer, AttendanceLogListSerializer, AttendanceEditSerializer,
+    LeaveSerializer, LeaveLedgerEntrySerializer, HolidaySerializer, DailyAttendanceStatusSerializer, ImportJobSerializer
 )
+from .cache import cached_response, get_cache_stats
+from .leave_balances import get_leave_balances, post_ledger_entries
+from .pairing import punch_types
+from .tasks import run_attendance_import
 from .utils import (
-    process_attendance_excel, generate_attendance_log,
-    process_daily_attendance, validate_attendance_edit,
-    get_attendance_summary
+    bulk_update_leave_status, get_attendance_summary, get_attendance_summaries,
+    get_calendar_summary, build_attendance_matrix, get_day_attendance,
+    is_late_arrival, late_arrival_q, get_default_shift_start, iter_attendance_export_rows, worked_time_expression,
+    ATTENDANCE_EXPORT_COLUMNS
 )
 
 # Template Views
@@ -61,7 +71,10 @@ def leave_request_create(request):
 def leave_request_detail(request, pk):
     """Display leave request details page"""
     leave = get_object_or_404(Leave, pk=pk)
-    return render(request, 'attendance/leave_request_detail.html', {'leave': leave})
+    return render(request, 'attendance/leave_request_detail.html', {
+        'leave': leave,
+        'balance': get_leave_balances(leave.employee_id)
+    })
 
 @login_required
 def upload_attendance(request):
@@ -72,7 +85,7 @@ def upload_attendance(request):
 def attendance_detail_view(request, log_id):
     """View for displaying and editing attendance details"""
     try:
-        log = AttendanceLog.objects.select_related('employee', 'employee__department').get(id=log_id)
+        log = AttendanceLog.objects.select_related('employee', 'employee__department', 'shift').get(id=log_id)
         personnel_id = request.GET.get('personnel_id')
         date_str = request.GET.get('date')
         
@@ -90,80 +103,51 @@ def attendance_detail_view(request, log_id):
             raise Http404("Invalid attendance record")
             
         # Get all raw attendance records for this employee on this date
-        attendance_records = AttendanceRecord.objects.filter(
+        attendance_records = AttendanceRecord.objects.for_work_dates(date).filter(
             employee=log.employee,
-            timestamp__date=date,
             is_active=True
         ).order_by('timestamp')
         
-        # Calculate statistics
-        total_hours = timedelta()
-        status = 'Absent'
-        is_late = False
-        first_in = None
-        last_out = None
-        
-        # Default shift start time (8:00 AM)
-        shift_start = time(8, 0)  # Using datetime.time
+        # IN/OUT and worked time come from the pairing stored by the rollup
+        shift_start = log.shift.start_time if log.shift else get_default_shift_start()
+        is_late = is_late_arrival(log)
+        status = ('Late' if is_late else 'Present') if log.first_in_time else 'Absent'
+        first_in = log.first_in_time
+        last_out = log.last_out_time
+        paired_types = punch_types(log.punch_intervals)
         
         records = []
-        if attendance_records:
-            # First record of the day is IN, last is OUT
-            first_record = attendance_records.first()
-            last_record = attendance_records.last()
-            
-            # Set first IN
-            first_in = first_record.timestamp.time()
-            is_late = first_in > shift_start
-            status = 'Late' if is_late else 'Present'
-            
-            # Set last OUT
-            last_out = last_record.timestamp.time()
-            
-            # Calculate total hours from first IN to last OUT
-            if first_in and last_out:
-                in_datetime = datetime.combine(date, first_in)
-                out_datetime = datetime.combine(date, last_out)
-                
-                # Handle case where checkout is next day
-                if out_datetime < in_datetime:
-                    out_datetime += timedelta(days=1)
-                    
-                total_hours = out_datetime - in_datetime
+        attendance_records = list(attendance_records)
+        for i, record in enumerate(attendance_records):
+            record_type = paired_types.get(timezone.localtime(record.timestamp).isoformat(), 'REPEAT')
+            is_special = i == 0 or i == len(attendance_records) - 1
+            if is_special:
+                badge_class = 'bg-primary'
+                label = ' (First)' if i == 0 else ' (Last)'
+            else:
+                badge_class = {'IN': 'bg-success', 'OUT': 'bg-danger'}.get(record_type, 'bg-secondary')
+                label = ''
             
-            # Prepare records for template, alternating between IN and OUT
-            for i, record in enumerate(attendance_records):
-                # First record is IN, last record is OUT, others alternate
-                if record == first_record:
-                    record_type = 'IN'
-                    is_special = True
-                    badge_class = 'bg-primary'
-                    label = ' (First)'
-                elif record == last_record:
-                    record_type = 'OUT'
-                    is_special = True
-                    badge_class = 'bg-primary'
-                    label = ' (Last)'
-                else:
-                    # Alternate between IN and OUT for middle records
-                    record_type = 'IN' if i % 2 == 0 else 'OUT'
-                    is_special = False
-                    badge_class = 'bg-success' if record_type == 'IN' else 'bg-danger'
-                    label = ''
-                
-                records.append({
-                    'id': record.id,
-                    'time': record.timestamp.strftime('%I:%M %p'),
-                    'type': record_type,
-                    'label': label,
-                    'source': record.event_description or '-',
-                    'device_name': record.device_name or '-',
-                    'is_special': is_special,
-                    'badge_class': badge_class
-                })
+            records.append({
+                'id': record.id,
+                'time': record.timestamp.strftime('%I:%M %p'),
+                'type': record_type,
+                'label': label,
+                'source': record.event_description or '-',
+                'device_name': record.device_name or '-',
+                'is_special': is_special,
+                'badge_class': badge_class
+            })
         
-        # Format total hours as decimal
-        total_hours_decimal = total_hours.total_seconds() / 3600
+        # Manual logs have no pairing, fall back to first in to last out
+        worked_minutes = log.worked_minutes
+        if not log.punch_intervals and first_in and last_out:
+            in_datetime = datetime.combine(date, first_in)
+            out_datetime = datetime.combine(date, last_out)
+            if out_datetime < in_datetime:
+                out_datetime += timedelta(days=1)
+            worked_minutes = int((out_datetime - in_datetime).total_seconds() // 60)
+        total_hours_decimal = worked_minutes / 60
         
         context = {
             'log': log,
@@ -176,6 +160,8 @@ def attendance_detail_view(request, log_id):
             'records': records,
             'stats': {
                 'total_hours': f"{total_hours_decimal:.2f}",
+                'break_hours': f"{log.break_minutes / 60:.2f}",
+                'shift_start': shift_start.strftime('%I:%M %p'),
                 'is_late': is_late,
                 'status': status,
                 'first_in': first_in.strftime('%I:%M %p') if first_in else '-',
@@ -197,6 +183,32 @@ class ShiftViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Shift.objects.filter(is_active=True)
 
+class ShiftRotationViewSet(viewsets.ModelViewSet):
+    """ViewSet for managing shift rotations and their steps"""
+    serializer_class = ShiftRotationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ShiftRotation.objects.filter(is_active=True).prefetch_related('steps__shift')
+
+class ShiftAssignmentViewSet(viewsets.ModelViewSet):
+    """ViewSet for the shift roster"""
+    serializer_class = ShiftAssignmentSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = ShiftAssignment.objects.filter(is_active=True)
+        employee = self.request.query_params.get('employee')
+        department = self.request.query_params.get('department')
+        if employee:
+            queryset = queryset.filter(employee_id=employee)
+        if department:
+            queryset = queryset.filter(department_id=department)
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
 class AttendanceRecordViewSet(viewsets.ModelViewSet):
     """ViewSet for managing raw attendance records"""
     serializer_class = AttendanceRecordSerializer
@@ -205,33 +217,30 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
     def upload_excel(self, request):
-        """Handle Excel file upload"""
+        """Store the uploaded Excel file and queue it for background import"""
         if 'file' not in request.FILES:
             return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            excel_file = request.FILES['file']
-            records_created, duplicates, total_records, new_employees, unique_dates = process_attendance_excel(excel_file)
-            
-            # Process logs for each unique date in the uploaded file
-            logs_created = 0
-            for date in unique_dates:
-                logs_created += process_daily_attendance(date)
-
-            return Response({
-                'message': 'File processed successfully',
-                'new_records': records_created,
-                'duplicate_records': duplicates,
-                'total_records': total_records,
-                'logs_created': logs_created,
-                'new_employees': new_employees,
-                'success': True
-            })
-        except Exception as e:
-            return Response({
-                'error': str(e),
-                'success': False
-            }, status=status.HTTP_400_BAD_REQUEST)
+        excel_file = request.FILES['file']
+        job = ImportJob.objects.create(
+            file=excel_file,
+            original_filename=excel_file.name,
+            created_by=request.user
+        )
+        transaction.on_commit(lambda: run_attendance_import.delay(job.id))
+
+        return Response({
+            'message': 'File queued for processing',
+            'job_id': job.id,
+            'status': job.status,
+            'success': True
+        }, status=status.HTTP_202_ACCEPTED)
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for polling attendance import jobs"""
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+    queryset = ImportJob.objects.all()
 
 class AttendanceLogViewSet(viewsets.ModelViewSet):
     """ViewSet for managing processed attendance logs"""
@@ -270,6 +279,51 @@ class LeaveViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(status=status)
         return queryset
 
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """
+        Approve or reject many leaves at once with {"ids": [...], "status":
+        "approved" | "rejected"}. Leaves that fail validation are reported
+        and left untouched; the rest are written together.
+        """
+        leave_ids = request.data.get('ids')
+        new_status = request.data.get('status')
+        if new_status not in ('approved', 'rejected'):
+            return Response({'error': 'status must be approved or rejected'}, status=400)
+        if not isinstance(leave_ids, list) or not leave_ids or not all(isinstance(leave_id, int) for leave_id in leave_ids):
+            return Response({'error': 'ids must be a non-empty list of leave ids'}, status=400)
+
+        results = bulk_update_leave_status(leave_ids, new_status, request.user)
+        return Response({
+            'updated': sum(1 for result in results if result['result'] == 'updated'),
+            'results': results
+        })
+
+class LeaveLedgerEntryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                              mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """
+    Leave ledger history, filtered by ?employee= and ?leave_type=. Entries
+    cannot be edited; a correction is posted as a new adjustment.
+    """
+    serializer_class = LeaveLedgerEntrySerializer
+    permission_classes = [IsAuthenticated]
+    queryset = LeaveLedgerEntry.objects.all()
+
+    def get_queryset(self):
+        queryset = LeaveLedgerEntry.objects.all()
+        employee = self.request.query_params.get('employee')
+        leave_type = self.request.query_params.get('leave_type')
+        if employee:
+            queryset = queryset.filter(employee_id=employee)
+        if leave_type:
+            queryset = queryset.filter(leave_type=leave_type)
+        return queryset
+
+    def perform_create(self, serializer):
+        entry = LeaveLedgerEntry(**serializer.validated_data, entry_type='adjustment', created_by=self.request.user)
+        post_ledger_entries([entry])
+        serializer.instance = entry
+
 class HolidayViewSet(viewsets.ModelViewSet):
     """ViewSet for managing holidays"""
     serializer_class = HolidaySerializer
@@ -279,7 +333,41 @@ class HolidayViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Holiday.objects.filter(is_active=True)
 
-from rest_framework.pagination import PageNumberPagination
+class DailyAttendanceStatusViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Materialized per-day statuses, e.g. ?status=absent&start_date=&end_date=
+    for an absence report answered from the (status, date) index
+    """
+    serializer_class = DailyAttendanceStatusSerializer
+    permission_classes = [IsAuthenticated]
+    queryset = DailyAttendanceStatus.objects.all()
+
+    def get_queryset(self):
+        queryset = DailyAttendanceStatus.objects.select_related(
+            'employee__department'
+        ).order_by('-date', 'employee__employee_number')
+        params = self.request.query_params
+        try:
+            start_date = parse_date(params.get('start_date', ''))
+            end_date = parse_date(params.get('end_date', ''))
+        except ValueError:
+            start_date = end_date = None
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        if params.get('department'):
+            queryset = queryset.filter(employee__department_id=params['department'])
+        if params.get('employee'):
+            queryset = queryset.filter(employee_id=params['employee'])
+        return queryset
+
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+import base64
 
 class LargeResultsSetPagination(PageNumberPagination):
     """Custom pagination class for large result sets"""
@@ -287,6 +375,74 @@ class LargeResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+class AttendanceLogKeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (date, id) in descending order.
+    Each page seeks straight to the cursor position, so deep pages cost the
+    same as the first one and no COUNT(*) query is issued.
+    """
+    page_size = 400
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            cursor_date, cursor_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(date__lte=cursor_date).filter(
+                Q(date__lt=cursor_date) | Q(id__lt=cursor_id)
+            )
+
+        rows = list(queryset.order_by('-date', '-id')[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            if isinstance(last, dict):
+                self.next_cursor = self.encode_cursor(last['date'], last['id'])
+            else:
+                self.next_cursor = self.encode_cursor(last.date, last.id)
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, cursor_date, cursor_id):
+        return base64.urlsafe_b64encode(f"{cursor_date.isoformat()}|{cursor_id}".encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            cursor_date, cursor_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.strptime(cursor_date, '%Y-%m-%d').date(), int(cursor_id)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data
+        })
+
+class Echo:
+    """File-like object whose write returns the value, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
 class AttendanceLogListViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for listing and retrieving attendance logs with filtering"""
     serializer_class = AttendanceLogSerializer
@@ -294,8 +450,18 @@ class AttendanceLogListViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AttendanceLog.objects.select_related('employee').all()
     pagination_class = LargeResultsSetPagination
 
+    @property
+    def paginator(self):
+        """Use keyset pagination when the client opts in with ?pagination=cursor"""
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = AttendanceLogKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
-        queryset = super().get_queryset().order_by('-date')
+        queryset = super().get_queryset().order_by('-date', '-id')
         
         # Get filter parameters
         start_date = self.request.query_params.get('start_date')
@@ -324,11 +490,12 @@ class AttendanceLogListViewSet(viewsets.ReadOnlyModelViewSet):
 
         if status:
             if status == 'late':
-                queryset = queryset.filter(is_late=True)
+                queryset = queryset.filter(late_arrival_q())
             elif status == 'present':
                 queryset = queryset.filter(first_in_time__isnull=False)
             elif status == 'absent':
-                queryset = queryset.filter(first_in_time__isnull=True)
+                # Absent days have no log; they are listed by the daily-status endpoint
+                queryset = queryset.none()
 
         if search:
             queryset = queryset.filter(
@@ -337,8 +504,63 @@ class AttendanceLogListViewSet(viewsets.ReadOnlyModelViewSet):
                 Q(employee__employee_number__icontains=search)
             )
 
+        if getattr(self, 'action', None) == 'list':
+            # Lists are read as flat dicts with the names joined in the database
+            return AttendanceLogListSerializer.values_queryset(queryset)
+
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export the filtered logs as CSV (streamed row by row) or XLSX
+        (written by openpyxl in write-only mode) with ?file_format=csv|xlsx.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'xlsx'):
+            return Response({'error': 'file_format must be csv or xlsx'}, status=400)
+
+        queryset = self.get_queryset().order_by('date', 'employee__employee_number')
+        rows = iter_attendance_export_rows(queryset)
+        filename = f"attendance_logs_{timezone.localdate():%Y%m%d}.{file_format}"
+
+        if file_format == 'csv':
+            writer = csv.writer(Echo())
+            lines = (writer.writerow(row) for row in itertools.chain([ATTENDANCE_EXPORT_COLUMNS], rows))
+            response = StreamingHttpResponse(lines, content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet('Attendance')
+        sheet.append(ATTENDANCE_EXPORT_COLUMNS)
+        for row in rows:
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return FileResponse(
+            output, as_attachment=True, filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    def list(self, request, *args, **kwargs):
+        try:
+            start_date = parse_date(request.query_params.get('start_date') or '')
+            end_date = parse_date(request.query_params.get('end_date') or '')
+        except ValueError:
+            start_date = end_date = None
+        data = cached_response(
+            'logs', request.query_params, start_date, end_date,
+            lambda: super(AttendanceLogListViewSet, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AttendanceLogListSerializer
+        return super().get_serializer_class()
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
@@ -348,48 +570,132 @@ class AttendanceLogListViewSet(viewsets.ReadOnlyModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_calendar_events(request):
-    """API endpoint for getting calendar events"""
+    """
+    API endpoint for getting calendar events.
+    With mode=summary one event per day is returned carrying the
+    present/late/absent/on-leave counts per department instead of one
+    event per employee per day.
+    """
     start_date = request.query_params.get('start')
     end_date = request.query_params.get('end')
+    department = request.query_params.get('department')
     
     try:
-        start = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end = datetime.strptime(end_date, '%Y-%m-%d').date()
-        
-        logs = AttendanceLog.objects.filter(
-            date__range=[start, end]
-        ).select_related('employee')
+        start = datetime.strptime(start_date[:10], '%Y-%m-%d').date()
+        end = datetime.strptime(end_date[:10], '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return Response({'error': 'Invalid date format'}, status=400)
+
+    if request.query_params.get('mode') == 'summary':
+        # Absent counts stop at today, so the summary also varies by date
+        events = cached_response(
+            'calendar', request.query_params, start, end,
+            lambda: _calendar_summary_events(start, end, department),
+            vary=[timezone.localdate()]
+        )
+    else:
+        events = cached_response(
+            'calendar', request.query_params, start, end,
+            lambda: _calendar_log_events(start, end, department)
+        )
+    return Response(events)
+
+def _calendar_summary_events(start, end, department):
+    """One FullCalendar event per day with the status counts per department"""
+    department_names = dict(Department.objects.values_list('id', 'name'))
+    events = []
+    for day in get_calendar_summary(start, end, department_id=department):
+        totals = day['totals']
+        color = '#6c757d' if day['is_holiday'] else '#28a745'
+        if not day['is_holiday'] and totals['absent'] > totals['present']:
+            color = '#dc3545'
+        events.append({
+            'id': day['date'].isoformat(),
+            'title': f"P {totals['present']} / L {totals['late']} / A {totals['absent']} / LV {totals['on_leave']}",
+            'start': day['date'].isoformat(),
+            'allDay': True,
+            'color': color,
+            'extendedProps': {
+                'is_holiday': day['is_holiday'],
+                'totals': totals,
+                'departments': [
+                    {'id': dept_id, 'name': department_names.get(dept_id), **counts}
+                    for dept_id, counts in day['departments'].items()
+                ]
+            }
+        })
+    return events
+
+def _calendar_log_events(start, end, department):
+    """One FullCalendar event per attendance log"""
+    logs = AttendanceLog.objects.filter(
+        date__range=[start, end]
+    ).select_related('employee', 'shift')
+    if department:
+        logs = logs.filter(employee__department_id=department)
+    
+    events = []
+    for log in logs:
+        status = 'Present'
+        color = '#28a745'  # green
         
-        events = []
-        for log in logs:
-            status = 'Present'
-            color = '#28a745'  # green
+        if not log.first_in_time:
+            status = 'Absent'
+            color = '#dc3545'  # red
+        elif is_late_arrival(log):
+            status = 'Late'
+            color = '#ffc107'  # yellow
             
-            if not log.first_in_time:
-                status = 'Absent'
-                color = '#dc3545'  # red
-            elif log.is_late:
-                status = 'Late'
-                color = '#ffc107'  # yellow
-                
-            events.append({
-                'id': log.id,
-                'title': f"{log.employee.get_full_name()} - {status}",
-                'start': log.date.isoformat(),
-                'end': log.date.isoformat(),
-                'color': color,
-                'extendedProps': {
-                    'employee_id': log.employee.id,
-                    'status': status,
-                    'in_time': log.first_in_time.strftime('%H:%M') if log.first_in_time else None,
-                    'out_time': log.last_out_time.strftime('%H:%M') if log.last_out_time else None
-                }
-            })
-            
-        return Response(events)
-    except (ValueError, TypeError):
+        events.append({
+            'id': log.id,
+            'title': f"{log.employee.get_full_name()} - {status}",
+            'start': log.date.isoformat(),
+            'end': log.date.isoformat(),
+            'color': color,
+            'extendedProps': {
+                'employee_id': log.employee.id,
+                'status': status,
+                'in_time': log.first_in_time.strftime('%H:%M') if log.first_in_time else None,
+                'out_time': log.last_out_time.strftime('%H:%M') if log.last_out_time else None
+            }
+        })
+    return events
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def attendance_cache_stats(request):
+    """Hit/miss counters of the cached attendance endpoints"""
+    stats = get_cache_stats()
+    if stats is None:
+        return Response({'error': 'Cache unavailable'}, status=503)
+    return Response(stats)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_leave_balance(request):
+    """Leave balances of one employee (?employee=), read from the balance snapshot"""
+    employee_id = request.query_params.get('employee')
+    if not employee_id or not employee_id.isdigit():
+        return Response({'error': 'employee is required'}, status=400)
+    employee = get_object_or_404(Employee, id=employee_id)
+    return Response({'employee_id': employee.id, **get_leave_balances(employee.id)})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_calendar_day(request):
+    """Drill-down for one calendar day: every active employee with their status"""
+    try:
+        day = datetime.strptime(request.query_params.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
         return Response({'error': 'Invalid date format'}, status=400)
 
+    employees = get_day_attendance(
+        day,
+        department_id=request.query_params.get('department'),
+        status=request.query_params.get('status')
+    )
+    return Response({'date': day.isoformat(), 'count': len(employees), 'employees': employees})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_employee_attendance(request, employee_id):
@@ -403,6 +709,12 @@ def get_employee_attendance(request, employee_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         employee = get_object_or_404(Employee, id=employee_id)
         summary = get_attendance_summary(employee, start_date, end_date)
@@ -413,12 +725,85 @@ def get_employee_attendance(request, employee_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def get_attendance_summaries_api(request):
+    """
+    Attendance summaries for many employees at once.
+    Takes start_date, end_date and either department or employees (a list of
+    employee ids, comma separated in the query string). Without either, all
+    active employees are summarized.
+    """
+    params = request.data if request.method == 'POST' else request.query_params
+    try:
+        start_date = datetime.strptime(str(params.get('start_date')), '%Y-%m-%d').date()
+        end_date = datetime.strptime(str(params.get('end_date')), '%Y-%m-%d').date()
+    except ValueError:
+        return Response(
+            {'error': 'start_date and end_date are required as YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end_date < start_date:
+        return Response({'error': 'end_date is before start_date'}, status=status.HTTP_400_BAD_REQUEST)
+
+    employees = Employee.objects.filter(is_active=True)
+    department = params.get('department')
+    employee_ids = params.get('employees')
+    if department:
+        employees = employees.filter(department_id=department)
+    if employee_ids:
+        if isinstance(employee_ids, str):
+            employee_ids = employee_ids.split(',')
+        try:
+            employees = employees.filter(id__in=[int(employee_id) for employee_id in employee_ids])
+        except (TypeError, ValueError):
+            return Response({'error': 'employees must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+    employee_ids = list(employees.order_by('employee_number').values_list('id', flat=True))
+    summaries = get_attendance_summaries(employee_ids, start_date, end_date)
+    return Response({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'count': len(summaries),
+        'results': summaries
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_attendance_matrix(request):
+    """
+    Employees x days attendance grid in columnar form.
+    Takes month (YYYY-MM) or start_date/end_date (at most 62 days) and an
+    optional department.
+    """
+    try:
+        if request.query_params.get('month'):
+            start_date = datetime.strptime(request.query_params['month'], '%Y-%m').date()
+            end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:
+            start_date = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return Response(
+            {'error': 'month (YYYY-MM) or start_date and end_date (YYYY-MM-DD) are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end_date < start_date or (end_date - start_date).days > 61:
+        return Response({'error': 'The range must cover 1 to 62 days'}, status=status.HTTP_400_BAD_REQUEST)
+
+    employees = Employee.objects.filter(is_active=True)
+    if request.query_params.get('department'):
+        employees = employees.filter(department_id=request.query_params['department'])
+    return Response(build_attendance_matrix(employees, start_date, end_date))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def attendance_detail_api(request, log_id):
     """API endpoint for getting attendance details"""
     try:
-        log = AttendanceLog.objects.select_related('employee').get(id=log_id)
+        log = AttendanceLog.objects.select_related('employee', 'employee__department').annotate(
+            worked_time=worked_time_expression()
+        ).get(id=log_id)
         data = {
             'id': log.id,
             'employee_name': log.employee.get_full_name(),
@@ -426,26 +811,37 @@ def attendance_detail_api(request, log_id):
             'department': log.employee.department.name if log.employee.department else None,
             'designation': log.employee.designation,
             'date': log.date,
-            'records': [
-                {
-                    'id': log.id,
-                    'timestamp': log.first_in_time.isoformat() if log.first_in_time else None,
-                    'event_point': 'IN',
-                    'source': log.source,
-                    'device_name': log.device
-                }
-            ]
+            'worked_minutes': int(log.worked_time.total_seconds() // 60) if log.worked_time else 0,
+            'break_minutes': log.break_minutes,
+            'intervals': log.punch_intervals,
+            'records': []
         }
         
-        # Add out time if exists
-        if log.last_out_time:
+        for interval in log.punch_intervals:
             data['records'].append({
                 'id': log.id,
-                'timestamp': log.last_out_time.isoformat(),
-                'event_point': 'OUT',
-                'source': log.source,
-                'device_name': log.device
+                'timestamp': interval['in'],
+                'event_point': 'IN',
+                'source': log.source
             })
+            if interval['out']:
+                data['records'].append({
+                    'id': log.id,
+                    'timestamp': interval['out'],
+                    'event_point': 'OUT',
+                    'source': log.source
+                })
+        
+        # Manual logs have no pairing, report their in and out times
+        if not log.punch_intervals:
+            for event_point, value in (('IN', log.first_in_time), ('OUT', log.last_out_time)):
+                if value:
+                    data['records'].append({
+                        'id': log.id,
+                        'timestamp': value.isoformat(),
+                        'event_point': event_point,
+                        'source': log.source
+                    })
             
         return Response(data)
     except AttendanceLog.DoesNotExist:
@@ -566,52 +962,65 @@ def calendar_events(request):
         if not start_date or not end_date:
             return Response({'error': 'Invalid date format'}, status=400)
             
-        # Get attendance logs for the date range
-        logs = AttendanceLog.objects.filter(
-            employee_id=employee_id,
-            date__range=[start_date, end_date]
-        ).select_related('employee')
-        
-        events = []
-        for log in logs:
-            status = 'Present'
-            color = '#28a745'  # Green for present
-            
-            if not log.first_in_time:
-                status = 'Absent'
-                color = '#dc3545'  # Red for absent
-            elif log.is_late:
-                status = 'Late'
-                color = '#ffc107'  # Yellow for late
-                
-            events.append({
-                'id': log.id,
-                'title': f"{status} ({log.first_in_time.strftime('%I:%M %p') if log.first_in_time else 'No In'} - {log.last_out_time.strftime('%I:%M %p') if log.last_out_time else 'No Out'})",
-                'start': log.date.isoformat(),
-                'color': color,
-                'extendedProps': {
-                    'status': status,
-                    'first_in': log.first_in_time.strftime('%I:%M %p') if log.first_in_time else '-',
-                    'last_out': log.last_out_time.strftime('%I:%M %p') if log.last_out_time else '-',
-                    'total_hours': log.total_hours if log.total_hours else '0.00'
-                }
-            })
-        
+        events = cached_response(
+            'calendar-events', request.query_params, start_date, end_date,
+            lambda: _employee_calendar_events(employee_id, start_date, end_date)
+        )
         return Response(events)
         
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+def _employee_calendar_events(employee_id, start_date, end_date):
+    """Calendar events of one employee's attendance logs"""
+    logs = AttendanceLog.objects.filter(
+        employee_id=employee_id,
+        date__range=[start_date, end_date]
+    ).select_related('employee', 'shift').annotate(worked_time=worked_time_expression())
+    
+    events = []
+    for log in logs:
+        status = 'Present'
+        color = '#28a745'  # Green for present
+        
+        if not log.first_in_time:
+            status = 'Absent'
+            color = '#dc3545'  # Red for absent
+        elif is_late_arrival(log):
+            status = 'Late'
+            color = '#ffc107'  # Yellow for late
+        
+        total_hours = '0.00'
+        if log.first_in_time and log.last_out_time:
+            # Paired minutes for system logs, past midnight included for manual ones
+            total_hours = f"{log.worked_time.total_seconds() / 3600:.2f}"
+            
+        events.append({
+            'id': log.id,
+            'title': f"{status} ({log.first_in_time.strftime('%I:%M %p') if log.first_in_time else 'No In'} - {log.last_out_time.strftime('%I:%M %p') if log.last_out_time else 'No Out'})",
+            'start': log.date.isoformat(),
+            'color': color,
+            'extendedProps': {
+                'status': status,
+                'first_in': log.first_in_time.strftime('%I:%M %p') if log.first_in_time else '-',
+                'last_out': log.last_out_time.strftime('%I:%M %p') if log.last_out_time else '-',
+                'total_hours': total_hours
+            }
+        })
+    return events
+
 @api_view(['GET'])
 def attendance_details(request, log_id):
     """Get detailed attendance information for a specific log"""
     try:
-        log = AttendanceLog.objects.select_related('employee').get(id=log_id)
+        log = AttendanceLog.objects.select_related('employee', 'shift').annotate(
+            worked_time=worked_time_expression()
+        ).get(id=log_id)
+        original = log.edits.filter(is_active=True).order_by('edit_timestamp').first()
         
         # Get raw attendance records for this date
-        records = AttendanceRecord.objects.filter(
+        records = AttendanceRecord.objects.for_work_dates(log.date).filter(
             employee=log.employee,
-            timestamp__date=log.date,
             is_active=True
         ).order_by('timestamp')
         
@@ -628,12 +1037,15 @@ def attendance_details(request, log_id):
             'log_id': log.id,
             'date': log.date.strftime('%b %d, %Y'),
             'employee': log.employee.get_full_name(),
-            'status': 'Late' if log.is_late else ('Present' if log.first_in_time else 'Absent'),
+            'status': 'Late' if is_late_arrival(log) else ('Present' if log.first_in_time else 'Absent'),
             'source': log.source or '-',
-            'original_in': log.original_in_time.strftime('%I:%M %p') if log.original_in_time else '-',
-            'original_out': log.original_out_time.strftime('%I:%M %p') if log.original_out_time else '-',
+            'original_in': original.original_first_in.strftime('%I:%M %p') if original else '-',
+            'original_out': original.original_last_out.strftime('%I:%M %p') if original else '-',
             'current_in': log.first_in_time.strftime('%I:%M %p') if log.first_in_time else '-',
             'current_out': log.last_out_time.strftime('%I:%M %p') if log.last_out_time else '-',
+            'worked_hours': f"{log.worked_time.total_seconds() / 3600 if log.worked_time else 0:.2f}",
+            'break_hours': f"{log.break_minutes / 60:.2f}",
+            'intervals': log.punch_intervals,
             'raw_records': raw_records
         })
     except AttendanceLog.DoesNotExist:
@@ -0,0 +1,147 @@
+from datetime import date, timedelta
+import numpy as np
+from django.conf import settings
+from employees.models import Employee
+from .cache import bump_named_version, get_named_version, is_shared_cache
+from .models import Holiday
+
+HOLIDAYS_VERSION = 'holidays'
+
+# Process-local calendars by weekend pattern, replaced when the holidays version changes
+_calendars = {}
+
+def get_weekend_days():
+    """Weekdays (Monday=0) that are not working days, from ATTENDANCE_WEEKEND_DAYS"""
+    return list(getattr(settings, 'ATTENDANCE_WEEKEND_DAYS', []))
+
+class WorkingCalendar:
+    """
+    Working days of one weekend pattern with the active holidays applied.
+    Each year is precomputed on first use into a NumPy bool array and its
+    running count, so counting the working days of a range costs one
+    subtraction per year it spans and the next working day one searchsorted.
+    """
+
+    def __init__(self, weekend_days, version=None):
+        self.weekend_days = tuple(sorted(weekend_days))
+        self.version = version
+        self._years = {}
+
+    def _year(self, year):
+        """(working, cumulative, holidays) of a year; cumulative[i] counts the working days before day i"""
+        if year not in self._years:
+            first_day = date(year, 1, 1)
+            days = np.arange(np.datetime64(first_day), np.datetime64(date(year + 1, 1, 1)))
+            # 1970-01-01 was a Thursday (weekday 3)
+            working = ~np.isin((days.astype(np.int64) + 3) % 7, self.weekend_days)
+            holidays = set(Holiday.objects.filter(
+                date__year=year, is_active=True
+            ).values_list('date', flat=True))
+            working[[(holiday - first_day).days for holiday in holidays]] = False
+            cumulative = np.concatenate(([0], np.cumsum(working)))
+            self._years[year] = (working, cumulative, holidays)
+        return self._years[year]
+
+    def _year_slices(self, start_date, end_date):
+        """Yield (year, first index, end index) covering start_date..end_date"""
+        for year in range(start_date.year, end_date.year + 1):
+            first_day = date(year, 1, 1)
+            first = (max(start_date, first_day) - first_day).days
+            last = (min(end_date, date(year, 12, 31)) - first_day).days
+            yield year, first, last + 1
+
+    def is_working_day(self, day):
+        return bool(self._year(day.year)[0][(day - date(day.year, 1, 1)).days])
+
+    def is_holiday(self, day):
+        return day in self._year(day.year)[2]
+
+    def holidays_between(self, start_date, end_date):
+        """Set of the active holidays from start_date to end_date"""
+        return {
+            holiday
+            for year, _, _ in self._year_slices(start_date, end_date)
+            for holiday in self._year(year)[2]
+            if start_date <= holiday <= end_date
+        }
+
+    def working_mask(self, start_date, end_date):
+        """Bool array with one entry per day from start_date to end_date, True on working days"""
+        parts = [self._year(year)[0][first:end] for year, first, end in self._year_slices(start_date, end_date)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+
+    def working_days_between(self, start_date, end_date):
+        """Number of working days from start_date to end_date, both included (0 if end_date is earlier)"""
+        if start_date > end_date:
+            return 0
+        count = 0
+        for year, first, end in self._year_slices(start_date, end_date):
+            cumulative = self._year(year)[1]
+            count += int(cumulative[end] - cumulative[first])
+        return count
+
+    def next_working_day(self, day, max_years=5):
+        """First working day after day, or None if none within max_years"""
+        day += timedelta(days=1)
+        for year in range(day.year, day.year + max_years):
+            working, cumulative, _ = self._year(year)
+            offset = (day - date(year, 1, 1)).days if year == day.year else 0
+            # The first index where the running count grows past offset's is the next working day
+            index = int(np.searchsorted(cumulative, cumulative[offset], side='right')) - 1
+            if index < len(working):
+                return date(year, 1, 1) + timedelta(days=index)
+        return None
+
+def get_holidays_version():
+    """
+    Version of the holidays, bumped through the shared cache whenever one
+    changes. Without a shared cache (or with one that cannot be reached)
+    other processes' bumps are never seen, so the active holiday dates
+    themselves are the version (one small query).
+    """
+    if is_shared_cache():
+        version = get_named_version(HOLIDAYS_VERSION)
+        if version is not None:
+            return version
+    return hash(tuple(Holiday.objects.filter(is_active=True).order_by('date').values_list('date', flat=True)))
+
+def get_working_calendar(weekend_days=None, version=None):
+    """
+    The calendar of a weekend pattern (ATTENDANCE_WEEKEND_DAYS by default),
+    rebuilt when the holidays change. version: the holidays version, when
+    already read by the caller
+    """
+    pattern = tuple(sorted(get_weekend_days() if weekend_days is None else weekend_days))
+    if version is None:
+        version = get_holidays_version()
+    calendar = _calendars.get(pattern)
+    if calendar is None or calendar.version != version:
+        calendar = _calendars[pattern] = WorkingCalendar(pattern, version)
+    return calendar
+
+def get_employee_calendars(employee_ids):
+    """
+    Calendar of each employee, following ATTENDANCE_LOCATION_WEEKEND_DAYS for
+    their location and the default weekend otherwise.
+    Returns: {employee_id: WorkingCalendar}
+    """
+    version = get_holidays_version()
+    default = get_working_calendar(version=version)
+    by_location = getattr(settings, 'ATTENDANCE_LOCATION_WEEKEND_DAYS', {})
+    if not by_location:
+        return {employee_id: default for employee_id in employee_ids}
+
+    locations = dict(Employee.objects.filter(id__in=employee_ids).values_list('id', 'location__code'))
+    return {
+        employee_id: get_working_calendar(by_location[locations[employee_id]], version)
+        if locations.get(employee_id) in by_location else default
+        for employee_id in employee_ids
+    }
+
+def invalidate_working_calendars():
+    """
+    Rebuild this process's calendars on next use, so the rest of the current
+    transaction sees the change, and every other process's once it commits
+    """
+    _calendars.clear()
+    bump_named_version(HOLIDAYS_VERSION)
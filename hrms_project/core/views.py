@@ -4,6 +4,8 @@ from django.contrib.auth import login, authenticate
 from django.contrib import messages
 from employees.models import Employee, Department
 from django.db.models import Count
+from django.utils import timezone
+from attendance.utils import get_employees_on_leave
 from .forms import LoginForm, SignUpForm
 
 def login_view(request):
@@ -42,6 +44,6 @@ def dashboard(request):
         'total_employees': Employee.objects.count(),
         'total_departments': Department.objects.count(),
         'present_today': 0,  # This will be implemented with attendance tracking
-        'on_leave': 0,  # This will be implemented with leave management
+        'on_leave': get_employees_on_leave(timezone.localdate()).count(),
     }
     return render(request, 'core/dashboard.html', context)
@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -182,6 +184,77 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'materialize-daily-attendance-status': {
+        'task': 'attendance.tasks.materialize_recent_daily_status',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'accrue-monthly-leave': {
+        'task': 'attendance.tasks.post_monthly_leave_accruals',
+        'schedule': crontab(day_of_month=1, hour=1, minute=0),
+    },
+}
+
+# Attendance import
+ATTENDANCE_IMPORT_CHUNK_SIZE = int(os.getenv('ATTENDANCE_IMPORT_CHUNK_SIZE', 5000))
+# Local hour at which a new working day starts; earlier punches belong to the previous day
+ATTENDANCE_WORKDAY_START_HOUR = int(os.getenv('ATTENDANCE_WORKDAY_START_HOUR', 0))
+# Start time (HH:MM) used to flag late arrivals on logs without a shift
+ATTENDANCE_DEFAULT_SHIFT_START = os.getenv('ATTENDANCE_DEFAULT_SHIFT_START', '08:00')
+# Shift applied to every employee without a roster entry (Shift id), and how
+# far around a shift's start/end punches still belong to that shift's day
+ATTENDANCE_DEFAULT_SHIFT_ID = os.getenv('ATTENDANCE_DEFAULT_SHIFT_ID')
+ATTENDANCE_SHIFT_WINDOW_BEFORE_MINUTES = int(os.getenv('ATTENDANCE_SHIFT_WINDOW_BEFORE_MINUTES', 240))
+ATTENDANCE_SHIFT_WINDOW_AFTER_MINUTES = int(os.getenv('ATTENDANCE_SHIFT_WINDOW_AFTER_MINUTES', 360))
+# Punches closer than this to the previous one are treated as repeated scans
+ATTENDANCE_PUNCH_DEBOUNCE_SECONDS = int(os.getenv('ATTENDANCE_PUNCH_DEBOUNCE_SECONDS', 120))
+# Comma separated weekdays (Monday=0) that are not working days
+ATTENDANCE_WEEKEND_DAYS = [
+    int(day) for day in os.getenv('ATTENDANCE_WEEKEND_DAYS', '4').split(',') if day.strip()
+]
+# Weekend overrides per employee location code, e.g. 'DXB:5,6;RUH:4,5'
+ATTENDANCE_LOCATION_WEEKEND_DAYS = {
+    code.strip(): [int(day) for day in days.split(',') if day.strip()]
+    for code, days in (
+        entry.split(':', 1) for entry in os.getenv('ATTENDANCE_LOCATION_WEEKEND_DAYS', '').split(';') if ':' in entry
+    )
+}
+# Leave days accrued per month and leave type, e.g. 'annual:2.5,sick:1.25'
+ATTENDANCE_LEAVE_ACCRUAL_DAYS = {
+    leave_type.strip(): float(days)
+    for leave_type, days in (
+        entry.split(':', 1) for entry in os.getenv('ATTENDANCE_LEAVE_ACCRUAL_DAYS', 'annual:2.5,sick:1.25').split(',') if ':' in entry
+    )
+}
+# Trailing days the nightly job re-materializes into DailyAttendanceStatus
+ATTENDANCE_DAILY_STATUS_DAYS = int(os.getenv('ATTENDANCE_DAILY_STATUS_DAYS', 7))
+
+# Cache
+# Cached attendance responses and calendars are invalidated by version counters
+# that the Celery workers bump too, so every process must share the cache: the
+# Redis instance at REDIS_CACHE_URL, or REDIS_URL by default. Set
+# ATTENDANCE_LOCAL_CACHE=True for a per-process memory cache instead (e.g. local
+# development without Redis); attendance responses are then never cached. The
+# test runner always uses the memory cache, so tests neither need Redis nor
+# write to it.
+REDIS_CACHE_URL = os.getenv('REDIS_CACHE_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+TESTING = sys.argv[1:2] == ['test']
+if os.getenv('ATTENDANCE_LOCAL_CACHE', 'False') == 'True' or TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+# Upper bound on how long a cached attendance response is kept; entries are
+# invalidated by data version, not by this timeout
+ATTENDANCE_CACHE_TIMEOUT = int(os.getenv('ATTENDANCE_CACHE_TIMEOUT', 86400))
 
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only for development